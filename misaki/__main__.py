@@ -0,0 +1,78 @@
+import argparse
+import json
+import sys
+
+def warm(args):
+    from . import espeak
+    cache = espeak.EspeakCache(args.cache)
+    lines = [line for line in (line.strip() for line in args.corpus) if line]
+    if args.language in ('en-us', 'en-gb'):
+        # Only words that miss the lexicon reach espeak, so run the corpus through the full English G2P.
+        from . import en
+        british = args.language == 'en-gb'
+        g2p = en.G2P(trf=False, british=british, fallback=espeak.EspeakFallback(british, cache=cache))
+        for i in range(0, len(lines), args.batch_size):
+            g2p.batch(lines[i:i+args.batch_size])
+    else:
+        espeak.EspeakWrapper.set_library(espeak.espeakng_loader.get_library_path())
+        espeak.EspeakWrapper.set_data_path(espeak.espeakng_loader.get_data_path())
+        g2p = espeak.EspeakG2P(args.language, cache=cache)
+        for line in lines:
+            g2p(line)
+    count, = cache.db.execute('SELECT COUNT(*) FROM phonemes WHERE language = ?', (args.language,)).fetchone()
+    print(f'{cache.path}: {count} cached words for {args.language}', file=sys.stderr)
+
+def serve(args):
+    import asyncio
+    from . import server
+    # Separate instances per worker, since one G2P (and its espeak backend) must not run two calls at once.
+    g2ps = {language: [server.load(language) for _ in range(args.workers)] for language in args.language}
+    where = args.unix or f'http://{args.host}:{args.port}'
+    print(f'serving {", ".join(g2ps)} on {where}', file=sys.stderr)
+    s = server.Server(g2ps, window=args.window_ms / 1000, max_batch=args.max_batch)
+    asyncio.run(s.serve(args.host, args.port, args.unix))
+
+def bench(args):
+    from . import bench
+    log = lambda line: print(line, file=sys.stderr)
+    report = bench.run(args.language or ['en-us', 'ja', 'zh', 'zh-1.1', 'ko', 'vi'], size=args.size, seed=args.seed, repeat=args.repeat, log=log)
+    if args.json:
+        bench.save(report, args.json)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as r:
+            for line in bench.compare(json.load(r), report):
+                print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='misaki')
+    commands = parser.add_subparsers(dest='command', required=True)
+    p = commands.add_parser('warm', help='pre-warm the espeak cache from a corpus, one text per line')
+    p.add_argument('corpus', type=argparse.FileType('r', encoding='utf-8'), help='corpus file, - for stdin')
+    p.add_argument('-l', '--language', default='en-us', help='espeak language, en-us and en-gb go through en.G2P (default: en-us)')
+    p.add_argument('--cache', help='SQLite cache path (default: espeak.sqlite3 under the misaki cache dir)')
+    p.add_argument('--batch-size', type=int, default=256)
+    p.set_defaults(func=warm)
+    p = commands.add_parser('serve', help='serve G2P over HTTP with JSON requests, micro-batched per language')
+    p.add_argument('-l', '--language', action='append', help='language to load, repeatable (default: en-us)')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8080)
+    p.add_argument('--unix', help='listen on this Unix socket path instead of TCP')
+    p.add_argument('--window-ms', type=float, default=5, help='how long to wait to batch requests together (default: 5)')
+    p.add_argument('--max-batch', type=int, default=64)
+    p.add_argument('--workers', type=int, default=1, help='G2P instances per language, each running one batch at a time (default: 1)')
+    p.set_defaults(func=serve)
+    p = commands.add_parser('bench', help='measure throughput and latency on synthetic corpora per language')
+    p.add_argument('-l', '--language', action='append', help='language to benchmark, repeatable (default: en-us ja zh zh-1.1 ko vi)')
+    p.add_argument('--size', type=int, default=200, help='texts per corpus (default: 200)')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--repeat', type=int, default=1)
+    p.add_argument('--json', help='write the machine-readable report to this path')
+    p.add_argument('--compare', help='compare against a report written earlier with --json')
+    p.set_defaults(func=bench)
+    args = parser.parse_args(argv)
+    if args.command == 'serve' and not args.language:
+        args.language = ['en-us']
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Tuple
+import asyncio
+import itertools
+import queue
+import threading
+
+class AsyncG2P:
+    """Runs any misaki G2P on a bounded thread pool so it does not block the event loop.
+    Calls that arrive within `window` seconds of each other are coalesced into one g2p.batch
+    call (and so one nlp.pipe call for en.G2P) when the wrapped G2P has a batch method.
+    G2Ps are not re-entrant, so each instance runs one call at a time; pass a list of
+    separately built instances to run that many calls at once."""
+    def __init__(self, g2p, max_workers=2, window=0.002, max_batch=64):
+        self.g2ps = list(g2p) if isinstance(g2p, (list, tuple)) else [g2p]
+        self.g2p = self.g2ps[0]
+        self.locks = [threading.Lock() for _ in self.g2ps]
+        self.idle = queue.SimpleQueue()
+        for i in range(len(self.g2ps)):
+            self.idle.put(i)
+        self.turns = itertools.cycle(range(len(self.g2ps)))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='misaki')
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = []
+        self.timer = None
+
+    async def acall(self, text: str) -> Tuple[str, object]:
+        loop = asyncio.get_running_loop()
+        if not hasattr(self.g2p, 'batch') or self.max_batch < 2:
+            return await loop.run_in_executor(self.executor, self.run, '__call__', text)
+        future = loop.create_future()
+        self.pending.append((text, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        items, self.pending = self.pending, []
+        if not items:
+            return
+        loop = items[0][1].get_loop()
+        done = loop.run_in_executor(self.executor, self.run, 'batch', [text for text, _ in items])
+        done.add_done_callback(lambda done: self.deliver(done, items))
+
+    def run(self, method, *args):
+        # Calls method on an idle G2P instance, waiting for one if all are busy.
+        i = self.idle.get()
+        try:
+            with self.locks[i]:
+                return getattr(self.g2ps[i], method)(*args)
+        finally:
+            self.idle.put(i)
+
+    def deliver(self, done, items):
+        error = None if done.cancelled() else done.exception()
+        if error is not None and len(items) > 1:
+            # One bad text must not fail every call it was coalesced with, so rerun them one by one
+            # and only the callers whose own text raises get the exception.
+            for text, future in items:
+                if not future.done():
+                    single = future.get_loop().run_in_executor(self.executor, self.run, '__call__', text)
+                    single.add_done_callback(lambda single, future=future: AsyncG2P.settle(future, single))
+            return
+        results = [None] * len(items) if done.cancelled() or error else done.result()
+        for (_, future), result in zip(items, results):
+            AsyncG2P.settle(future, done, result)
+
+    @staticmethod
+    def settle(future, done, result=None):
+        if future.done():
+            return
+        elif done.cancelled():
+            future.cancel()
+        elif done.exception() is not None:
+            future.set_exception(done.exception())
+        else:
+            future.set_result(done.result() if result is None else result)
+
+    async def astream(self, text: str) -> AsyncIterator[Tuple[str, object]]:
+        # Sentence by sentence for G2Ps with a stream method, otherwise the whole text at once.
+        if not hasattr(self.g2p, 'stream'):
+            yield await self.acall(text)
+            return
+        loop = asyncio.get_running_loop()
+        # A stream stays on one instance, holding its lock only while computing the next sentence.
+        i = next(self.turns)
+        sentences = self.g2ps[i].stream(text)
+        end = object()
+        while True:
+            result = await loop.run_in_executor(self.executor, self.step, i, sentences, end)
+            if result is end:
+                break
+            yield result
+
+    def step(self, i, sentences, end):
+        with self.locks[i]:
+            return next(sentences, end)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
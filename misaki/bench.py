@@ -0,0 +1,140 @@
+# End-to-end throughput and latency benchmark.
+# The corpora are synthetic, generated from the short phrase lists below with a fixed seed,
+# so runs are reproducible and results comparable across misaki versions.
+from . import __version__
+from typing import Dict, List
+import json
+import platform
+import random
+import time
+
+PHRASES = {
+    'en': dict(
+        short=['Save changes', 'Open settings', 'Sign in', 'Try again later.', 'Your download is ready.',
+               'Delete this item?', 'Battery low', 'No results found.', 'Welcome back!', 'Check your connection.'],
+        sentences=['The old lighthouse keeper walked along the rocky shore every evening.',
+                   'She read the letter twice before folding it into her coat pocket.',
+                   'Our team reviewed the proposal and suggested a few small changes.',
+                   'When the rain stopped, the children ran outside to play in the puddles.',
+                   'He wound the clock, then sat by the window to watch the wind in the trees.',
+                   'A quiet morning is the best time to think about difficult problems.',
+                   'The museum will close early on Friday because of the holiday.',
+                   'They used to live near the station, but they moved to the countryside.'],
+        numbers=['The meeting is on {month} {day}, {year} at {hour}:{minute:02d}.', 'It costs ${dollars}.{cents:02d} plus tax.',
+                 'Call {a}-{b:04d} before {hour} PM.', 'About {big:,} people attended, up {pct}% from {year}.',
+                 'She finished {nth} out of {count} runners in {secs}.{frac} seconds.', 'Order #{big} ships in {count} days.'],
+        months=['January', 'March', 'May', 'July', 'September', 'November'],
+    ),
+    'ja': dict(
+        join='',
+        short=['設定を保存しました。', 'もう一度お試しください。', 'ダウンロードが完了しました。', '新しいメッセージがあります。',
+               'ログインしてください。', '検索結果はありません。', 'おかえりなさい！', '接続を確認してください。'],
+        sentences=['今日はとても良い天気なので、公園まで散歩に行きました。', '駅の近くに新しいパン屋ができたそうです。',
+                   '彼は毎朝早く起きて、コーヒーを飲みながら新聞を読みます。', '会議の資料は明日までに準備しておいてください。',
+                   '雨が止んだら、子供たちは外へ遊びに出かけました。', '図書館は祝日のため、金曜日は早く閉まります。'],
+        numbers=['会議は{year}年{month_num}月{day}日の{hour}時{minute}分からです。', '価格は{dollars}円です。',
+                 '参加者は約{big}人でした。', '{count}日以内に発送します。', '割引率は{pct}パーセントです。'],
+    ),
+    'zh': dict(
+        join='',
+        short=['保存设置', '请稍后再试。', '下载已完成。', '您有新消息。', '请先登录。', '没有找到结果。', '欢迎回来！', '请检查网络连接。'],
+        sentences=['今天天气很好，我们去公园散步了。', '听说车站附近开了一家新的面包店。', '他每天早上很早起床，一边喝咖啡一边看报纸。',
+                   '请在明天之前准备好会议的资料。', '雨停了以后，孩子们跑到外面去玩。', '因为节假日，图书馆星期五会提前关门。'],
+        numbers=['会议在{year}年{month_num}月{day}日{hour}点{minute}分开始。', '价格是{dollars}元。', '大约有{big}人参加。',
+                 '订单将在{count}天内发货。', '折扣是百分之{pct}。'],
+    ),
+    'ko': dict(
+        short=['설정을 저장했습니다.', '나중에 다시 시도하세요.', '다운로드가 완료되었습니다.', '새 메시지가 있습니다.',
+               '로그인하세요.', '검색 결과가 없습니다.', '다시 오신 것을 환영합니다!', '연결을 확인하세요.'],
+        sentences=['오늘은 날씨가 좋아서 공원까지 산책을 했습니다.', '역 근처에 새로운 빵집이 생겼다고 합니다.',
+                   '그는 매일 아침 일찍 일어나서 커피를 마시며 신문을 읽습니다.', '회의 자료는 내일까지 준비해 주세요.',
+                   '비가 그치자 아이들은 밖으로 놀러 나갔습니다.', '도서관은 공휴일 때문에 금요일에 일찍 문을 닫습니다.'],
+        numbers=['회의는 {year}년 {month_num}월 {day}일 {hour}시 {minute}분에 시작합니다.', '가격은 {dollars}원입니다.',
+                 '약 {big}명이 참석했습니다.', '{count}일 안에 발송됩니다.', '할인율은 {pct}퍼센트입니다.'],
+    ),
+    'vi': dict(
+        short=['Lưu thay đổi', 'Vui lòng thử lại sau.', 'Tải xuống đã hoàn tất.', 'Bạn có tin nhắn mới.', 'Đăng nhập',
+               'Không tìm thấy kết quả.', 'Chào mừng trở lại!', 'Kiểm tra kết nối mạng.'],
+        sentences=['Hôm nay trời rất đẹp nên chúng tôi đi dạo trong công viên.', 'Nghe nói gần nhà ga mới mở một tiệm bánh mì.',
+                   'Mỗi sáng anh ấy dậy sớm, vừa uống cà phê vừa đọc báo.', 'Vui lòng chuẩn bị tài liệu cuộc họp trước ngày mai.',
+                   'Khi trời tạnh mưa, bọn trẻ chạy ra ngoài chơi.', 'Thư viện sẽ đóng cửa sớm vào thứ sáu vì ngày lễ.'],
+        numbers=['Cuộc họp bắt đầu lúc {hour} giờ {minute} phút ngày {day} tháng {month_num} năm {year}.', 'Giá là {dollars} đồng.',
+                 'Có khoảng {big} người tham dự.', 'Đơn hàng sẽ được giao trong {count} ngày.', 'Giảm giá {pct} phần trăm.'],
+    ),
+}
+
+def _ordinal(n):
+    return f"{n}{'th' if 10 <= n % 100 < 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')}"
+
+def corpora(language, size=200, seed=0) -> Dict[str, List[str]]:
+    # Short UI strings, multi-sentence paragraphs and number-heavy sentences for a language.
+    phrases = PHRASES[language.split('-')[0]]
+    rng = random.Random(seed)
+    def fill(template):
+        return template.format(
+            year=rng.randint(1890, 2030), month=rng.choice(phrases.get('months', [''])), month_num=rng.randint(1, 12),
+            day=rng.randint(1, 28), hour=rng.randint(1, 12), minute=rng.randint(0, 59), dollars=rng.randint(1, 9999),
+            cents=rng.randint(0, 99), a=rng.randint(200, 999), b=rng.randint(0, 9999), big=rng.randint(1000, 9999999),
+            pct=rng.randint(1, 99), count=rng.randint(2, 60), nth=_ordinal(rng.randint(1, 120)), secs=rng.randint(9, 99),
+            frac=rng.randint(0, 99),
+        )
+    return {
+        'short': [rng.choice(phrases['short']) for _ in range(size)],
+        'paragraph': [phrases.get('join', ' ').join(rng.sample(phrases['sentences'], rng.randint(3, 6))) for _ in range(size // 4)],
+        'numbers': [fill(rng.choice(phrases['numbers'])) for _ in range(size)],
+    }
+
+def count_tokens(ps, tokens):
+    return len(tokens) if isinstance(tokens, list) else len(ps.split())
+
+def bench(g2p, texts, warmup=5):
+    for text in texts[:warmup]:
+        g2p(text)
+    latencies, tokens = [], 0
+    for text in texts:
+        start = time.perf_counter()
+        ps, toks = g2p(text)
+        latencies.append(time.perf_counter() - start)
+        tokens += count_tokens(ps, toks)
+    total = sum(latencies)
+    chars = sum(len(text) for text in texts)
+    latencies.sort()
+    pick = lambda q: round(1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))], 4)
+    return {
+        'texts': len(texts), 'chars': chars, 'tokens': tokens, 'seconds': round(total, 6),
+        'chars_per_sec': round(chars / total, 1), 'tokens_per_sec': round(tokens / total, 1),
+        'latency_ms': {'p50': pick(0.5), 'p95': pick(0.95), 'p99': pick(0.99)},
+    }
+
+def run(languages, size=200, seed=0, repeat=1, log=None) -> dict:
+    from .server import load
+    results = []
+    for language in languages:
+        start = time.perf_counter()
+        g2p = load(language)
+        load_seconds = time.perf_counter() - start
+        for corpus, texts in corpora(language, size=size, seed=seed).items():
+            result = dict(language=language, corpus=corpus, load_seconds=round(load_seconds, 3), **bench(g2p, texts * repeat))
+            results.append(result)
+            if log is not None:
+                log(f"{language:8} {corpus:10} {result['chars_per_sec']:>10.0f} chars/s {result['tokens_per_sec']:>9.0f} tokens/s  "
+                    f"p50 {result['latency_ms']['p50']:.2f} p95 {result['latency_ms']['p95']:.2f} p99 {result['latency_ms']['p99']:.2f} ms")
+    return {
+        'misaki': __version__, 'python': platform.python_version(), 'platform': platform.platform(),
+        'size': size, 'seed': seed, 'repeat': repeat, 'results': results,
+    }
+
+def save(report, path):
+    with open(path, 'w', encoding='utf-8') as w:
+        json.dump(report, w, ensure_ascii=False, indent=2)
+
+def compare(old, new) -> List[str]:
+    # One line per (language, corpus) in both reports, with the new/old throughput and p95 ratios.
+    before = {(r['language'], r['corpus']): r for r in old['results']}
+    lines = []
+    for r in new['results']:
+        o = before.get((r['language'], r['corpus']))
+        if o is not None:
+            lines.append(f"{r['language']:8} {r['corpus']:10} chars/s x{r['chars_per_sec'] / o['chars_per_sec']:.2f}  "
+                         f"p95 x{r['latency_ms']['p95'] / o['latency_ms']['p95']:.2f}  ({old['misaki']} -> {new['misaki']})")
+    return lines
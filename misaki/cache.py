@@ -0,0 +1,232 @@
+from . import __version__, data
+from .token import MToken
+from collections import OrderedDict
+from dataclasses import fields
+from typing import List, Optional, Tuple
+import functools
+import hashlib
+import importlib.metadata
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+FIELDS = tuple(f.name for f in fields(MToken))
+
+def configuration(g2p) -> dict:
+    # Everything about a G2P instance that can change its output: its class, its plain settings,
+    # the types of its components (e.g. whether it has a fallback) and the version of its spaCy model.
+    config = {'class': f'{type(g2p).__module__}.{type(g2p).__qualname__}'}
+    for k, v in sorted(vars(g2p).items()):
+        if isinstance(getattr(type(g2p), k, None), functools.cached_property):
+            # Loaded on first use, so only sometimes present.
+            continue
+        elif v is None or isinstance(v, (bool, int, float, str)):
+            config[k] = v
+        else:
+            try:
+                config[k] = hashlib.sha256(json.dumps(v, sort_keys=True).encode()).hexdigest()[:16]
+            except (TypeError, ValueError):
+                config[k] = type(v).__qualname__
+    model = getattr(g2p, 'model', None)
+    if isinstance(model, str):
+        try:
+            config['model'] = f'{model}/{importlib.metadata.version(model)}'
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    return config
+
+def encode(result) -> bytes:
+    ps, tokens = result
+    if isinstance(tokens, list) and all(isinstance(t, MToken) for t in tokens):
+        tokens = [[getattr(t, f) for f in FIELDS] for t in tokens]
+    elif tokens is not None:
+        raise TypeError(f'cannot cache tokens of type {type(tokens).__name__}')
+    return json.dumps([ps, tokens], ensure_ascii=False, separators=(',', ':')).encode()
+
+def decode(value: bytes):
+    ps, tokens = json.loads(value)
+    return ps, None if tokens is None else [MToken(*t) for t in tokens]
+
+class MemoryCache:
+    """In-process LRU cache, bounded by entries and by total bytes."""
+    def __init__(self, max_entries=4096, max_bytes=64 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: bytes, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            self.size += len(value) - (0 if old is None else len(old))
+            self.entries[key] = value
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, old = self.entries.popitem(last=False)
+                self.size -= len(old)
+
+class SharedMemoryCache:
+    """Cache in a named shared memory block that every process on the machine can attach to, e.g. the
+    workers of a Pool or several servers. It is a set-associative table of fixed-size slots, evicting the
+    least recently written slot of a set. There are no locks: a checksum makes a torn read a miss, so
+    concurrent writers can only lose entries, never return wrong ones. Results larger than a slot are not cached."""
+    HEADER = struct.Struct('<32sdII')  # key, written at, length, crc32
+
+    def __init__(self, name='misaki-cache', size=64 << 20, slot_size=2048, ways=4):
+        from multiprocessing import resource_tracker, shared_memory
+        self.slot_size = slot_size
+        self.ways = ways
+        self.sets = size // (slot_size * ways)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=self.sets * ways * slot_size)
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.sets = self.shm.size // (slot_size * ways)
+        # The block outlives the processes using it, until unlink(), so keep the resource tracker
+        # from unlinking it when the process that created or attached it exits.
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.buf = self.shm.buf
+
+    def slots(self, key: bytes):
+        first = int.from_bytes(key[:8], 'little') % self.sets * self.ways
+        return [(first + i) * self.slot_size for i in range(self.ways)]
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        for offset in self.slots(key):
+            k, _, length, crc = SharedMemoryCache.HEADER.unpack_from(self.buf, offset)
+            if k == key and length <= self.slot_size - SharedMemoryCache.HEADER.size:
+                start = offset + SharedMemoryCache.HEADER.size
+                value = bytes(self.buf[start:start+length])
+                if zlib.crc32(key + value) == crc:
+                    return value
+        return None
+
+    def put(self, key: bytes, value: bytes):
+        if len(value) > self.slot_size - SharedMemoryCache.HEADER.size:
+            return
+        slots = self.slots(key)
+        headers = [SharedMemoryCache.HEADER.unpack_from(self.buf, offset) for offset in slots]
+        offset = next((o for o, h in zip(slots, headers) if h[0] == key), None)
+        if offset is None:
+            offset = min(zip(slots, headers), key=lambda oh: oh[1][1])[0]
+        start = offset + SharedMemoryCache.HEADER.size
+        self.buf[start:start+len(value)] = value
+        SharedMemoryCache.HEADER.pack_into(self.buf, offset, key, time.time(), len(value), zlib.crc32(key + value))
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        from multiprocessing import resource_tracker
+        resource_tracker.register(self.shm._name, 'shared_memory')
+        self.shm.unlink()
+
+class SQLiteCache:
+    """Persistent cache in a SQLite file, shared by every process that opens it. Entries written by
+    another misaki version are deleted on open, and the least recently used ones beyond max_entries
+    are evicted as new ones come in."""
+    def __init__(self, path=None, max_entries=100000):
+        self.path = os.path.join(data.cache_dir(), 'results.sqlite3') if path is None else path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.pid = None
+        self.puts = 0
+        self.db.execute('CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, version TEXT, value BLOB, used REAL) WITHOUT ROWID')
+        self.db.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+        self.db.execute('DELETE FROM results WHERE version != ?', (__version__,))
+
+    @property
+    def db(self):
+        # SQLite connections must not cross a fork, so each process opens its own.
+        if self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            # WAL with synchronous=NORMAL only syncs at checkpoints, a lost entry is just recomputed.
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.pid = os.getpid()
+        return self.connection
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        with self.lock:
+            row = self.db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.db.execute('UPDATE results SET used = ? WHERE key = ?', (time.time(), key))
+        return None if row is None else row[0]
+
+    def put(self, key: bytes, value: bytes):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (key, __version__, value, time.time()))
+            self.puts += 1
+            # Counting rows on every put would dominate, so evict in steps of 1% of max_entries.
+            if self.puts >= max(1, self.max_entries // 100):
+                self.puts = 0
+                self.db.execute(
+                    'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,),
+                )
+
+class CachedG2P:
+    """Wraps any misaki G2P with a result cache keyed by a hash of (misaki version, language, G2P configuration, text).
+    Hits return fresh copies of the cached tokens, so callers may modify them. Other attributes and methods
+    (stream, chunks, ...) are passed through to the wrapped G2P uncached."""
+    def __init__(self, g2p, cache=None, language=None):
+        self.g2p = g2p
+        self.cache = MemoryCache() if cache is None else cache
+        self.language = type(g2p).__module__.rpartition('.')[2] if language is None else language
+        self.prefix = json.dumps([__version__, self.language, configuration(g2p)], sort_keys=True)
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        return getattr(self.g2p, name)
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(json.dumps([self.prefix, text]).encode()).digest()
+
+    def __call__(self, text: str, *args, **kwargs) -> Tuple[str, object]:
+        if args or kwargs:
+            return self.g2p(text, *args, **kwargs)
+        key = self.key(text)
+        value = self.cache.get(key)
+        if value is not None:
+            self.hits += 1
+            return decode(value)
+        self.misses += 1
+        result = self.g2p(text)
+        self.cache.put(key, encode(result))
+        return result
+
+    def batch(self, texts: List[str]) -> List[Tuple[str, object]]:
+        # Only the misses go to the wrapped G2P, in one batch call if it has one.
+        keys = [self.key(text) for text in texts]
+        results = [None] * len(texts)
+        misses = []
+        for i, key in enumerate(keys):
+            value = self.cache.get(key)
+            if value is None:
+                misses.append(i)
+            else:
+                results[i] = decode(value)
+        self.hits += len(texts) - len(misses)
+        self.misses += len(misses)
+        if misses:
+            new = [texts[i] for i in misses]
+            new = self.g2p.batch(new) if hasattr(self.g2p, 'batch') else [self.g2p(text) for text in new]
+            for i, result in zip(misses, new):
+                results[i] = result
+                self.cache.put(keys[i], encode(result))
+        return results
@@ -0,0 +1,6 @@
+import os
+
+def cache_dir():
+    path = os.environ.get('MISAKI_CACHE_DIR') or os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'misaki')
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -1,34 +1,55 @@
-from . import data
-from .token import MToken
-from dataclasses import dataclass, replace
-from num2words import num2words
-from typing import List, Optional, Tuple, Union
+from . import __version__, data, lexdb, num2en, registry
+from .token import MToken, slotted
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import contextlib
+import functools
 import importlib.resources
 import json
-import numpy as np
+import os
 import re
-import spacy
+import time
 import unicodedata
+import zlib
 
 DIPHTHONGS = frozenset('AIOQWYʤʧ')
 def stress_weight(ps):
     return sum(2 if c in DIPHTHONGS else 1 for c in ps) if ps else 0
 
-@dataclass
+@slotted
+@dataclass(frozen=True)
 class TokenContext:
     future_vowel: Optional[bool] = None
     future_to: bool = False
 
+# Every possible TokenContext, so G2P.token_context can share them instead of allocating one per token.
+TOKEN_CONTEXTS = {(v, t): TokenContext(v, t) for v in (None, False, True) for t in (False, True)}
+
+@dataclass
+class CallProfile:
+    # Seconds spent in each stage of one G2P call, in pipeline order, and how its words were resolved.
+    text: str
+    stages: Dict[str, float] = field(default_factory=dict)
+    sources: Dict[str, int] = field(default_factory=dict)
+
 # BEGIN HACK: Scope so we don't use regex elsewhere.
 def make_subtokenize_once():
-    import regex
-    SUBTOKEN_REGEX = regex.compile(r"^['‘’]+|\p{Lu}(?=\p{Lu}\p{Ll})|(?:^-)?(?:\d?[,.]?\d)+|[-_]+|['‘’]{2,}|\p{L}*?(?:['‘’]\p{L})*?\p{Ll}(?=\p{Lu})|\p{L}+(?:['‘’]\p{L})*|[^-_\p{L}'‘’\d]|['‘’]+$")
-    return (lambda word: regex.findall(SUBTOKEN_REGEX, word))
+    @functools.lru_cache(maxsize=None)
+    def compiled():
+        # Imported and compiled on first use, so importing this module stays cheap.
+        import regex
+        return regex.compile(r"^['‘’]+|\p{Lu}(?=\p{Lu}\p{Ll})|(?:^-)?(?:\d?[,.]?\d)+|[-_]+|['‘’]{2,}|\p{L}*?(?:['‘’]\p{L})*?\p{Ll}(?=\p{Lu})|\p{L}+(?:['‘’]\p{L})*|[^-_\p{L}'‘’\d]|['‘’]+$")
+    split = functools.lru_cache(maxsize=65536)(lambda word: tuple(compiled().findall(word)))
+    # Single characters and lowercase words never split, and they make up most of ordinary prose.
+    return (lambda word: (word,) if len(word) == 1 or (word.isalpha() and word.islower()) else split(word))
 subtokenize = make_subtokenize_once()
 del make_subtokenize_once
 # END HACK: Delete make_subtokenize_once so we can't call it again.
 
 LINK_REGEX = re.compile(r'\[([^\]]+)\]\(([^\)]*)\)')
+SENTENCE_BREAK_REGEX = re.compile(r'(\w*)([.!?…]+)[\'"”’)\]]*(?=(\s+)[\'"“‘(\[]*[A-Z0-9])')
+ABBREVIATIONS = frozenset(['Capt', 'Col', 'Dr', 'Gen', 'Jr', 'Lt', 'Mr', 'Mrs', 'Ms', 'Mt', 'No', 'Prof', 'Rev', 'Sgt', 'Sr', 'St', 'etc', 'vs'])
 
 SUBTOKEN_JUNKS = frozenset("',-._‘’/")
 PUNCTS = frozenset(';:,.!?—…"“”')
@@ -37,6 +58,8 @@ NON_QUOTE_PUNCTS = frozenset(p for p in PUNCTS if p not in '"“”')
 # https://github.com/explosion/spaCy/blob/master/spacy/glossary.py
 PUNCT_TAGS = frozenset([".",",","-LRB-","-RRB-","``",'""',"''",":","$","#",'NFP'])
 PUNCT_TAG_PHONEMES = {'-LRB-':'(', '-RRB-':')', '``':chr(8220), '""':chr(8221), "''":chr(8221)}
+# Tokens whose phonemes come out the same for any tag spaCy would plausibly give them.
+UNTAGGED_PUNCT_TAGS = {'(':'-LRB-', ')':'-RRB-', chr(8220):'``', chr(8221):"''"}
 
 LEXICON_ORDS = [39, 45, *range(65, 91), *range(97, 123)]
 CONSONANTS = frozenset('bdfhjklmnpstvwzðŋɡɹɾʃʒʤʧθ')
@@ -50,6 +73,10 @@ CURRENCIES = {
 }
 ORDINALS = frozenset(['st', 'nd', 'rd', 'th'])
 
+# Lowercased words whose special case in Lexicon.get_special_case depends on the tag in some casing.
+# A, AN, I, THE and TO only do when all caps, and all-caps words are always tagged.
+TAGGED_WORDS = frozenset(['am', 'by', 'used', 'vs'])
+
 ADD_SYMBOLS = {'.':'dot', '/':'slash'}
 SYMBOLS = {'%':'percent', '&':'and', '+':'plus', '@':'at'}
 
@@ -105,9 +132,24 @@ class Lexicon:
                 e[k.lower()] = v
         return {**e, **d}
 
-    def __init__(self, british):
+    def __init__(self, british, compiled=False, derived=False, cache_size=32768):
         self.british = british
         self.cap_stresses = (0.5, 2)
+        self.derived = None
+        self.number_words = None
+        self.set_cache_size(cache_size)
+        if compiled:
+            tables = lexdb.load(Lexicon.compiled_path(british, derived) if compiled is True else compiled)
+            self.golds, self.silvers = tables['gold'], tables['silver']
+            self.compound_keys = tables['compound'] if 'compound' in tables else self.find_compound_keys()
+            self.compound_prefixes = frozenset(k[:i] for k in self.compound_keys for i in range(len(k)+1))
+            if derived:
+                if 'derived' not in tables:
+                    raise ValueError(f'{compiled} was compiled without derived forms')
+                self.derived = tables['derived']
+            return
+        elif derived:
+            raise ValueError('The derived forms index requires compiled=True')
         self.golds = {}
         self.silvers = {}
         with importlib.resources.open_text(data, f"{'gb' if british else 'us'}_gold.json") as r:
@@ -123,6 +165,66 @@ class Lexicon:
                 assert 'DEFAULT' in vs, vs
                 for v in vs.values():
                     assert v is None or all(c in vocab for c in v), v
+        self.compound_keys = self.find_compound_keys()
+        self.compound_prefixes = frozenset(k[:i] for k in self.compound_keys for i in range(len(k)+1))
+
+    def find_compound_keys(self):
+        return frozenset(k for d in (self.golds, self.silvers, SYMBOLS) for k in d if not k.isalpha())
+
+    @staticmethod
+    def compile(british, path, derived=False):
+        lexicon = Lexicon(british)
+        tables = dict(gold=lexicon.golds, silver=lexicon.silvers, compound=dict.fromkeys(lexicon.compound_keys, ''))
+        if derived:
+            tables['derived'] = lexicon.derive_forms()
+        lexdb.write(path, tables)
+        return path
+
+    @staticmethod
+    def compiled_path(british, derived=False):
+        # Compiled once per source data and misaki version, then shared by every process via the page cache.
+        prefix = 'gb' if british else 'us'
+        stats = []
+        for name in (f'{prefix}_gold.json', f'{prefix}_silver.json'):
+            with importlib.resources.path(data, name) as p:
+                st = os.stat(p)
+                stats.append(f'{name}:{st.st_size}:{st.st_mtime_ns}')
+        fingerprint = zlib.crc32(' '.join([__version__, str(lexdb.VERSION), *stats]).encode())
+        path = os.path.join(data.cache_dir(), f"{prefix}_lexicon{'_derived' if derived else ''}_{fingerprint:08x}.mlex")
+        if not os.path.exists(path):
+            Lexicon.compile(british, path, derived)
+        return path
+
+    def derive_forms(self):
+        # Maps each regular inflection of a lowercase gold/silver word to the s/ed/ing stems get_word would pick,
+        # coded per suffix as the number of letters to strip, the letter replacing -ies/-ing, or '-' for none.
+        forms = {}
+        for k in {*self.golds, *self.silvers}:
+            if k != k.lower():
+                continue
+            candidates = [k+'s', k+"'s", k+'es', k+'d', k+'ed', k+'ing']
+            if k.endswith('y'):
+                candidates.append(k[:-1]+'ies')
+            if k.endswith('e'):
+                candidates.append(k[:-1]+'ing')
+            if k[-1:] in 'bcdgklmnprstvxz':
+                candidates.append(k+k[-1]+'ing')
+            if k.endswith('c'):
+                candidates.append(k+'king')
+            for w in candidates:
+                if w in forms or self.is_known(w, None):
+                    continue
+                stems = (self.s_stem(w), self.ed_stem(w), self.ing_stem(w))
+                if any(stems):
+                    forms[w] = ''.join('-' if s is None else (str(len(w)-len(s)) if w.startswith(s) else s[-1]) for s in stems)
+        return forms
+
+    def set_cache_size(self, cache_size):
+        # Memoizes __call__ on everything that affects its result; None or 0 disables the cache.
+        self.cache = functools.lru_cache(maxsize=cache_size)(self.resolve) if cache_size else None
+
+    def cache_info(self):
+        return None if self.cache is None else self.cache.cache_info()
 
     def get_NNP(self, word):
         ps = [self.golds.get(c.upper()) for c in word if c.isalpha()]
@@ -167,6 +269,16 @@ class Lexicon:
             return self.golds['used']['DEFAULT'], 4
         return None, None
 
+    def needs_tag(self, word):
+        # Conservative: False only if no tag can change the phonemes of this spaCy token.
+        if not word.isalpha():
+            return not word.isspace() and word not in UNTAGGED_PUNCT_TAGS and not all(c in NON_QUOTE_PUNCTS for c in word)
+        elif word.lower() in TAGGED_WORDS or word == word.upper() or not (len(word) == 1 or word[1:].islower()):
+            return True
+        return any(isinstance(self.golds.get(s), dict) for w in {word, word.lower()} for s in (
+            w, w[:-1], w[:-2], w[:-3], w[:-3]+'y', w[:-3]+'e', w[:-4]
+        ))
+
     @staticmethod
     def get_parent_tag(tag):
         if tag is None:
@@ -222,14 +334,18 @@ class Lexicon:
             return stem + ('ɪ' if self.british else 'ᵻ') + 'z'
         return stem + 'z'
 
+    def s_stem(self, word):
+        if len(word) > 2 and word.endswith('s') and not word.endswith('ss') and self.is_known(word[:-1], None):
+            return word[:-1]
+        elif (word.endswith("'s") or (len(word) > 4 and word.endswith('es') and not word.endswith('ies'))) and self.is_known(word[:-2], None):
+            return word[:-2]
+        elif len(word) > 4 and word.endswith('ies') and self.is_known(word[:-3]+'y', None):
+            return word[:-3] + 'y'
+        return None
+
     def stem_s(self, word, tag, stress, ctx):
-        if len(word) > 2 and word.endswith('s') and not word.endswith('ss') and self.is_known(word[:-1], tag):
-            stem = word[:-1]
-        elif (word.endswith("'s") or (len(word) > 4 and word.endswith('es') and not word.endswith('ies'))) and self.is_known(word[:-2], tag):
-            stem = word[:-2]
-        elif len(word) > 4 and word.endswith('ies') and self.is_known(word[:-3]+'y', tag):
-            stem = word[:-3] + 'y'
-        else:
+        stem = self.s_stem(word)
+        if stem is None:
             return None, None
         stem, rating = self.lookup(stem, tag, stress, ctx)
         return self._s(stem), rating
@@ -250,12 +366,16 @@ class Lexicon:
             return stem[:-1] + 'ɾᵻd'
         return stem + 'ᵻd'
 
+    def ed_stem(self, word):
+        if word.endswith('d') and not word.endswith('dd') and self.is_known(word[:-1], None):
+            return word[:-1]
+        elif word.endswith('ed') and not word.endswith('eed') and self.is_known(word[:-2], None):
+            return word[:-2]
+        return None
+
     def stem_ed(self, word, tag, stress, ctx):
-        if word.endswith('d') and not word.endswith('dd') and self.is_known(word[:-1], tag):
-            stem = word[:-1]
-        elif word.endswith('ed') and not word.endswith('eed') and self.is_known(word[:-2], tag):
-            stem = word[:-2]
-        else:
+        stem = self.ed_stem(word)
+        if stem is None:
             return None, None
         stem, rating = self.lookup(stem, tag, stress, ctx)
         return self._ed(stem), rating
@@ -275,18 +395,39 @@ class Lexicon:
             return stem[:-1] + 'ɾɪŋ'
         return stem + 'ɪŋ'
 
+    def ing_stem(self, word):
+        if word.endswith('ing') and self.is_known(word[:-3], None):
+            return word[:-3]
+        elif word.endswith('ing') and self.is_known(word[:-3]+'e', None):
+            return word[:-3] + 'e'
+        elif re.search(r'([bcdgklmnprstvxz])\1ing$|cking$', word) and self.is_known(word[:-4], None):
+            return word[:-4]
+        return None
+
     def stem_ing(self, word, tag, stress, ctx):
-        if word.endswith('ing') and self.is_known(word[:-3], tag):
-            stem = word[:-3]
-        elif word.endswith('ing') and self.is_known(word[:-3]+'e', tag):
-            stem = word[:-3] + 'e'
-        elif re.search(r'([bcdgklmnprstvxz])\1ing$|cking$', word) and self.is_known(word[:-4], tag):
-            stem = word[:-4]
-        else:
+        stem = self.ing_stem(word)
+        if stem is None:
             return None, None
         stem, rating = self.lookup(stem, tag, stress, ctx)
         return self._ing(stem), rating
 
+    def may_resolve(self, word):
+        # False only if resolve must return None for an ASCII word with non-letters. Those resolve as numbers,
+        # '.' special cases, alphabetic words ending in ' or 's, or non-alphabetic keys once get_word strips
+        # a suffix, which only touches the last 4 letters, so the rest of the word must start some such key.
+        if not word.isascii() or '.' in word or word.isalpha():
+            return True
+        elif (word[0].isdigit() or word[0] in ',-') and Lexicon.is_number(word, True):
+            return True
+        elif (word.endswith("'") and word[:-1].isalpha()) or (word.endswith("'s") and word[:-2].isalpha()):
+            return True
+        head = word[:-4]
+        if head and head not in self.compound_prefixes and head.lower() not in self.compound_prefixes:
+            return False
+        return any(k in self.compound_keys for w in {word, word.lower()} for k in (
+            w, w[:-1], w[:-2], w[:-3], w[:-4], w[:-3]+'y', w[:-3]+'e', w[:-2]+"'s"
+        ))
+
     def get_word(self, word, tag, stress, ctx):
         ps, rating = self.get_special_case(word, tag, stress, ctx)
         if ps is not None:
@@ -297,6 +438,15 @@ class Lexicon:
             return self.lookup(word[:-2] + "'s", tag, stress, ctx)
         elif word.endswith("'") and self.is_known(word[:-1], tag):
             return self.lookup(word[:-1], tag, stress, ctx)
+        stems = None if self.derived is None else self.derived.get(word)
+        if stems is not None:
+            for code, suffix, s in zip(stems, (self._s, self._ed, self._ing), (stress, stress, 0.5 if stress is None else stress)):
+                if code != '-':
+                    ps, rating = self.lookup(word[:-int(code)] if code.isdigit() else word[:-3] + code, tag, s, ctx)
+                    ps = suffix(ps)
+                    if ps is not None:
+                        return ps, rating
+            return None, None
         _s, rating = self.stem_s(word, tag, stress, ctx)
         if _s is not None:
             return _s, rating
@@ -325,14 +475,16 @@ class Lexicon:
         if word.startswith('-'):
             result.append(self.lookup('minus', None, None, None))
             word = word[1:]
+        if self.number_words is None:
+            self.number_words = {w: self.lookup(w, None, -2 if w == 'point' else None, None) for w in num2en.WORDS}
         def extend_num(num, first=True, escape=False):
-            splits = re.split(r'[^a-z]+', num if escape else num2words(int(num)))
+            splits = num if escape else num2en.cardinal(int(num))
             for i, w in enumerate(splits):
                 if w != 'and' or '&' in num_flags:
                     if first and i == 0 and len(splits) > 1 and w == 'one' and 'a' in num_flags:
                         result.append(('ə', 4))
                     else:
-                        result.append(self.lookup(w, None, -2 if w == 'point' else None, None))
+                        result.append(self.number_words.get(w) or self.lookup(w, None, -2 if w == 'point' else None, None))
                 elif w == 'and' and 'n' in num_flags and result:
                     result[-1] = (result[-1][0] + 'ən', result[-1][1])
         if not is_head and '.' not in word:
@@ -372,16 +524,16 @@ class Lexicon:
                 result.append(self.stem_s(unit+'s', None, None, None) if abs(num) != 1 and unit != 'pence' else self.lookup(unit, None, None, None))
         else:
             if is_digit(word):
-                word = num2words(int(word), to='ordinal' if suffix in ORDINALS else ('year' if not result and len(word) == 4 else 'cardinal'))
+                words = (num2en.ordinal if suffix in ORDINALS else (num2en.year if not result and len(word) == 4 else num2en.cardinal))(int(word))
             elif '.' not in word:
-                word = num2words(int(word.replace(',', '')), to='ordinal' if suffix in ORDINALS else 'cardinal')
+                words = (num2en.ordinal if suffix in ORDINALS else num2en.cardinal)(int(word.replace(',', '')))
             else:
                 word = word.replace(',', '')
                 if word[0] == '.':
-                    word = 'point ' + ' '.join(num2words(int(n)) for n in word[1:])
+                    words = ['point'] + [w for n in word[1:] for w in num2en.cardinal(int(n))]
                 else:
-                    word = num2words(float(word))
-            extend_num(word, escape=True)
+                    words = num2en.decimal(word)
+            extend_num(words, escape=True)
         if not result:
             print('❌', 'TODO:NUM', word, currency)
             return None, None
@@ -420,45 +572,93 @@ class Lexicon:
         return all(is_digit(c) or c in ',.' or (is_head and i == 0 and c == '-') for i, c in enumerate(word))
 
     def __call__(self, t, ctx):
-        word = (t.text if t.alias is None else t.alias).replace(chr(8216), "'").replace(chr(8217), "'")
+        args = (t.text if t.alias is None else t.alias, t.tag, t.stress, t.currency, t.num_flags, t.is_head, ctx)
+        return self.resolve(*args) if self.cache is None else self.cache(*args)
+
+    @staticmethod
+    def normalize(word):
+        word = word.replace(chr(8216), "'").replace(chr(8217), "'")
         word = unicodedata.normalize('NFKC', word)
-        word = ''.join(Lexicon.numeric_if_needed(c) for c in word)
+        return ''.join(Lexicon.numeric_if_needed(c) for c in word)
+
+    def resolve(self, word, tag, token_stress, currency, num_flags, is_head, ctx):
+        word = Lexicon.normalize(word)
         stress = None if word == word.lower() else self.cap_stresses[int(word == word.upper())]
-        ps, rating = self.get_word(word, t.tag, stress, ctx)
+        ps, rating = self.get_word(word, tag, stress, ctx)
         if ps is not None:
-            return apply_stress(self.append_currency(ps, t.currency), t.stress), rating
-        elif Lexicon.is_number(word, t.is_head):
-            ps, rating = self.get_number(word, t.currency, t.is_head, t.num_flags)
-            return apply_stress(ps, t.stress), rating
+            return apply_stress(self.append_currency(ps, currency), token_stress), rating
+        elif Lexicon.is_number(word, is_head):
+            ps, rating = self.get_number(word, currency, is_head, num_flags)
+            return apply_stress(ps, token_stress), rating
         elif not all(ord(c) in LEXICON_ORDS for c in word):
             return None, None
         if word != word.lower() and (word == word.upper() or word[1:] == word[1:].lower()):
-            ps, rating = self.get_word(word.lower(), t.tag, stress, ctx)
+            ps, rating = self.get_word(word.lower(), tag, stress, ctx)
             if ps is not None:
-                return apply_stress(self.append_currency(ps, t.currency), t.stress), rating
+                return apply_stress(self.append_currency(ps, currency), token_stress), rating
         return None, None
 
+    def source(self, t):
+        # Which part of the lexicon resolves a token: special, gold, silver, nnp, stem or number.
+        # Only G2P.profile uses this, so it repeats some of resolve's work rather than slowing resolve down.
+        word = Lexicon.normalize(t.text if t.alias is None else t.alias)
+        ctx = TokenContext()
+        for w in dict.fromkeys([word, word.lower()]):
+            if self.get_special_case(w, t.tag, None, ctx)[0] is not None:
+                return 'special'
+            for k in (w, w[:-2] + "'s" if w.endswith("s'") else None, w[:-1] if w.endswith("'") else None):
+                if k is not None and self.is_known(k, t.tag):
+                    if k == k.upper() and k not in self.golds:
+                        return 'gold' if k.lower() in self.golds else 'nnp'
+                    return 'gold' if k in self.golds else ('silver' if k in self.silvers else 'nnp')
+            if self.get_word(w, t.tag, None, ctx)[0] is not None:
+                return 'stem'
+            elif w == word and Lexicon.is_number(w, t.is_head):
+                return 'number'
+        return None
+
 class G2P:
-    def __init__(self, trf=False, british=False, fallback=None, unk='❓'):
+    def __init__(self, trf=False, british=False, fallback=None, unk='❓', compiled=False, derived=False, gated_tagging=False, cache_size=32768):
         self.british = british
-        name = f"en_core_web_{'trf' if trf else 'sm'}"
-        if not spacy.util.is_package(name):
-            spacy.cli.download(name)
-        components = ['transformer' if trf else 'tok2vec', 'tagger']
-        self.nlp = spacy.load(name, enable=components)
-        self.lexicon = Lexicon(british)
+        self.model = f"en_core_web_{'trf' if trf else 'sm'}"
+        self.compiled = compiled
+        self.derived = derived
+        self.cache_size = cache_size
         self.fallback = fallback if fallback else None
         self.unk = unk
+        self.gated_tagging = gated_tagging
+        self.profiler: Optional[Callable[[CallProfile], None]] = None
+
+    # The spaCy model and the lexicon load on first use, or up front with warmup().
+    # Both are shared with every other G2P in the process that uses the same model or lexicon, see registry.
+    @functools.cached_property
+    def nlp(self):
+        components = ['transformer' if self.model.endswith('trf') else 'tok2vec', 'tagger']
+        return registry.spacy_pipeline(self, self.model, enable=components)
+
+    @functools.cached_property
+    def lexicon(self):
+        # G2Ps with different cache sizes get separate lexicons, so set_cache_size on a shared one affects them all.
+        key = ('lexicon', self.british, self.compiled, self.derived, self.cache_size)
+        return registry.acquire(self, key, lambda: Lexicon(self.british, compiled=self.compiled, derived=self.derived, cache_size=self.cache_size))
+
+    def warmup(self):
+        self.nlp, self.lexicon
+        subtokenize('WarmUp')
+        return self
 
     @staticmethod
     def preprocess(text):
-        result = ''
+        # Features are keyed by the (start, end) character offsets of their link text in the result.
+        result = []
+        pos = 0
         tokens = []
         features = {}
         last_end = 0
         text = text.lstrip()
         for m in LINK_REGEX.finditer(text):
-            result += text[last_end:m.start()]
+            result.append(text[last_end:m.start()])
+            pos += m.start() - last_end
             tokens.extend(text[last_end:m.start()].split())
             f = m.group(2)
             if is_digit(f[1 if f[:1] in ('-', '+') else 0:]):
@@ -474,25 +674,95 @@ class G2P:
             else:
                 f = None
             if f is not None:
-                features[len(tokens)] = f
-            result += m.group(1)
+                features[pos, pos + len(m.group(1))] = f
+            result.append(m.group(1))
+            pos += len(m.group(1))
             tokens.append(m.group(1))
             last_end = m.end()
         if last_end < len(text):
-            result += text[last_end:]
+            result.append(text[last_end:])
             tokens.extend(text[last_end:].split())
-        return result, tokens, features
+        return ''.join(result), tokens, features
 
-    def tokenize(self, text: str, tokens, features) -> List[MToken]:
-        doc = self.nlp(text)
+    @staticmethod
+    def sentence_breaks(text, spans=()):
+        # A single trailing space stays with the sentence, longer whitespace starts the next one like spaCy would split it.
+        breaks = [m.end() + (m.group(3)[0] == ' ') for m in SENTENCE_BREAK_REGEX.finditer(text) if not (
+            m.group(2) == '.' and (m.group(1) in ABBREVIATIONS or (len(m.group(1)) == 1 and m.group(1).isupper()))
+        ) and not any(a < m.end() < b for a, b in spans)]
+        return [b for a, b in zip([0] + breaks, breaks + [len(text)]) if a < b]
+
+    @staticmethod
+    def split_sentences(text, tokens, features):
+        # Yields (text, tokens, features) per sentence, with features shifted to each sentence's offsets,
+        # or reindexed to its tokens for features keyed by token index.
+        by_index = any(isinstance(k, int) for k in features)
+        offsets, spans, pos = [], [], 0
+        for t in tokens:
+            pos = text.index(t, pos)
+            offsets.append(pos)
+            if any(c.isspace() for c in t):
+                spans.append((pos, pos + len(t)))
+            pos += len(t)
+        start = k = 0
+        for end in G2P.sentence_breaks(text, spans):
+            j = k
+            while j < len(offsets) and offsets[j] < end:
+                j += 1
+            if by_index:
+                yield text[start:end], tokens[k:j], {i-k: v for i, v in features.items() if k <= i < j}
+            else:
+                yield text[start:end], tokens[k:j], {(a-start, b-start): v for (a, b), v in features.items() if start <= a < end}
+            start, k = end, j
+
+    @staticmethod
+    def guess_tag(text):
+        if text.isspace():
+            return '_SP'
+        elif text in UNTAGGED_PUNCT_TAGS:
+            return UNTAGGED_PUNCT_TAGS[text]
+        elif any(c in '.!?' for c in text):
+            return '.'
+        elif all(c == ',' for c in text):
+            return ','
+        return ':' if all(c in NON_QUOTE_PUNCTS for c in text) else 'XX'
+
+    def gated_tag(self, text, needs_tag=None):
+        # Tags only the sentences where some token's phonemes may depend on its tag, see Lexicon.needs_tag.
+        needs_tag = self.lexicon.needs_tag if needs_tag is None else needs_tag
+        doc = self.nlp.make_doc(text)
+        start = 0
+        for end in G2P.sentence_breaks(text):
+            span = doc.char_span(start, end, alignment_mode='expand')
+            start = end
+            if span is None:
+                continue
+            elif any(needs_tag(t.text) for t in span):
+                for t, tagged in zip(span, self.nlp(span.as_doc())):
+                    t.tag_ = tagged.tag_
+            else:
+                for t in span:
+                    t.tag_ = G2P.guess_tag(t.text)
+        return doc
+
+    def tokenize(self, text: str, tokens, features, doc=None) -> List[MToken]:
+        if doc is None:
+            doc = self.gated_tag(text) if self.gated_tagging else self.nlp(text)
         # print(doc._.trf_data.all_outputs[0].data.shape, doc._.trf_data.all_outputs[0].lengths)
         mutable_tokens = [MToken(text=t.text, tag=t.tag_, whitespace=t.whitespace_) for t in doc]
         if not features:
             return mutable_tokens
-        align = spacy.training.Alignment.from_strings(tokens, [t.text for t in mutable_tokens])
-        for k, v in features.items():
-            assert isinstance(v, str) or isinstance(v, int) or v in (0.5, -0.5), (k, v)
-            for i, j in enumerate(np.where(align.y2x.data == k)[0]):
+        elif any(isinstance(k, int) for k in features):
+            # Features keyed by token index, from a custom preprocess.
+            import numpy as np
+            import spacy
+            align = spacy.training.Alignment.from_strings(tokens, [t.text for t in mutable_tokens])
+            matches = ((v, np.where(align.y2x.data == k)[0]) for k, v in features.items())
+        else:
+            matches = G2P.match_features(doc, features)
+        for v, js in matches:
+            assert isinstance(v, str) or isinstance(v, int) or v in (0.5, -0.5), v
+            for i, j in enumerate(js):
                 if j >= len(mutable_tokens):
                     continue
                 if not isinstance(v, str):
@@ -507,6 +777,21 @@ class G2P:
                     mutable_tokens[j].num_flags = v.lstrip('#')
         return mutable_tokens
 
+    @staticmethod
+    def match_features(doc, features):
+        # Yields each feature with the indices of the non-space tokens overlapping its character span,
+        # in one pass over features and tokens sorted by offset.
+        j = 0
+        for (start, end), v in sorted(features.items(), key=lambda kv: kv[0]):
+            while j < len(doc) and doc[j].idx + len(doc[j].text) <= start:
+                j += 1
+            js, k = [], j
+            while k < len(doc) and doc[k].idx < end:
+                if not doc[k].is_space:
+                    js.append(k)
+                k += 1
+            yield v, js
+
     def fold_left(self, tokens: List[MToken]) -> List[MToken]:
         result = []
         for t in tokens:
@@ -519,11 +804,12 @@ class G2P:
         words = []
         currency = None
         for i, token in enumerate(tokens):
-            if token.alias is None and token.phonemes is None:
-                ts = [replace(token, text=t, whitespace='') for t in subtokenize(token.text)]
-            else:
+            ts = subtokenize(token.text) if token.alias is None and token.phonemes is None else None
+            if ts is None or (len(ts) == 1 and ts[0] == token.text):
                 ts = [token]
-            ts[-1].whitespace = token.whitespace
+            else:
+                ts = [replace(token, text=t, whitespace='') for t in ts]
+                ts[-1].whitespace = token.whitespace
             for j, t in enumerate(ts):
                 if t.alias is not None or t.phonemes is not None:
                     pass
@@ -559,7 +845,7 @@ class G2P:
     def token_context(ctx, ps, token):
         vowel = ctx.future_vowel
         vowel = next((None if c in NON_QUOTE_PUNCTS else (c in VOWELS) for c in ps if any(c in s for s in (VOWELS, CONSONANTS, NON_QUOTE_PUNCTS))), vowel) if ps else vowel
-        return TokenContext(future_vowel=vowel, future_to=token.is_to())
+        return TOKEN_CONTEXTS[vowel, token.is_to()]
 
     @staticmethod
     def resolve_tokens(tokens):
@@ -589,18 +875,115 @@ class G2P:
             tokens[i].phonemes = apply_stress(tokens[i].phonemes, -0.5)
 
     def __call__(self, text: str, preprocess=True) -> Tuple[str, List[MToken]]:
+        if self.profiler is not None:
+            return self.profiled_call(text, preprocess)
         preprocess = G2P.preprocess if preprocess == True else preprocess
         text, tokens, features = preprocess(text) if preprocess else (text, [], {})
-        tokens = self.tokenize(text, tokens, features)
-        tokens = self.fold_left(tokens)
-        tokens = G2P.retokenize(tokens)
+        return self.resolve(self.tokenize(text, tokens, features))
+
+    def batch(self, texts: List[str], preprocess=True, batch_size=256, n_process=1) -> List[Tuple[str, List[MToken]]]:
+        preprocess = G2P.preprocess if preprocess == True else preprocess
+        items = [preprocess(text) if preprocess else (text, [], {}) for text in texts]
+        texts = (text for text, _, _ in items)
+        docs = map(self.gated_tag, texts) if self.gated_tagging else self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+        docs = [self.prepare(self.tokenize(text, tokens, features, doc=doc)) for (text, tokens, features), doc in zip(items, docs)]
+        fallbacks = self.prefetch(docs)
+        return [self.resolve_words(words, fallbacks) for words in docs]
+
+    def stream(self, text: str, preprocess=True) -> Iterator[Tuple[str, List[MToken]]]:
+        preprocess = G2P.preprocess if preprocess == True else preprocess
+        text, tokens, features = preprocess(text) if preprocess else (text, [], {})
+        for sentence in G2P.split_sentences(text, tokens, features):
+            yield self.resolve(self.tokenize(*sentence))
+
+    def session(self, lookahead=2, preprocess=True) -> 'Session':
+        return Session(self, lookahead=lookahead, preprocess=preprocess)
+
+    @staticmethod
+    def boundary(token):
+        # How good a place the end of token is to cut a chunk: 0 after a sentence, 1 after a clause, 2 between words.
+        # 3 inside a word, which only an overlong word forces.
+        text = token.text.rstrip('\'"”’)]')
+        if not token.whitespace:
+            return 3
+        elif text[-1:] in ('.', '!', '?', '…'):
+            return 0
+        return 1 if text[-1:] in (';', ':', ',', '—', '–', '-') else 2
+
+    def chunks(self, tokens: Union[str, Iterable[MToken]], budget=510) -> Iterator[Tuple[str, List[MToken]]]:
+        # Splits resolved tokens (or a text, phonemized sentence by sentence) into chunks of at most budget phonemes,
+        # each cut after the last sentence end that fits, else the last clause end, else the last word.
+        if isinstance(tokens, str):
+            tokens = (t for _, ts in self.stream(tokens) for t in ts)
+        chunk, sizes = [], []
+        for t in tokens:
+            chunk.append(t)
+            sizes.append(len(self.unk if t.phonemes is None else t.phonemes) + len(t.whitespace))
+            while chunk and sum(sizes) - len(chunk[-1].whitespace) > budget:
+                if len(chunk) == 1:
+                    # A single token over budget, e.g. a very long number, is cut between its own words.
+                    ps = self.merge([chunk[0]])[0].strip()
+                    while len(ps) > budget:
+                        cut = ps.rfind(' ', 0, budget + 1)
+                        cut = budget if cut <= 0 else cut
+                        yield ps[:cut].strip(), [chunk[0]]
+                        ps = ps[cut:].strip()
+                    yield ps, chunk
+                    chunk, sizes = [], []
+                    break
+                fits, total = [], 0
+                for i, (x, n) in enumerate(zip(chunk[:-1], sizes)):
+                    total += n
+                    if total - len(x.whitespace) > budget:
+                        break
+                    fits.append((G2P.boundary(x), -i))
+                i = -min(fits)[1] if fits else 0
+                ps, ts = self.merge(chunk[:i+1])
+                if ps.strip():
+                    yield ps.strip(), ts
+                chunk, sizes = chunk[i+1:], sizes[i+1:]
+        if chunk:
+            ps, ts = self.merge(chunk)
+            if ps.strip():
+                yield ps.strip(), ts
+
+    def prepare(self, tokens: List[MToken]) -> List[Union[MToken, List[MToken]]]:
+        return G2P.retokenize(self.fold_left(tokens))
+
+    def prefetch(self, docs: List[List[Union[MToken, List[MToken]]]]) -> dict:
+        # Resolves the words of prepared docs that are likely to need the fallback with one fallback.batch call.
+        # The guess ignores context, so a word it misses still goes through the fallback one at a time.
+        if not hasattr(self.fallback, 'batch'):
+            return {}
+        ctx = TokenContext()
+        words = []
+        for w in (w for ws in docs for w in ws):
+            if not isinstance(w, list):
+                if w.phonemes is None and self.lexicon(w, ctx)[0] is None:
+                    words.append(w.text)
+            elif any(t.phonemes is None and not all(c in SUBTOKEN_JUNKS for c in t.text) and self.lexicon(t, ctx)[0] is None for t in w):
+                t = MToken.merge_tokens(w)
+                if self.lexicon(t, ctx)[0] is None:
+                    words.append(t.text)
+        return self.fallback.batch(words) if words else {}
+
+    def resolve(self, tokens: List[MToken]) -> Tuple[str, List[MToken]]:
+        words = self.prepare(tokens)
+        return self.resolve_words(words, self.prefetch([words]))
+
+    def resolve_words(self, tokens: List[Union[MToken, List[MToken]]], fallbacks={}) -> Tuple[str, List[MToken]]:
+        self.lookup_words(tokens, lambda t: fallbacks[t.text] if t.text in fallbacks else self.fallback(t))
+        return self.merge(tokens)
+
+    def lookup_words(self, tokens: List[Union[MToken, List[MToken]]], fallback):
+        # Right to left, so each word sees the context of the words after it.
         ctx = TokenContext()
         for i, w in reversed(list(enumerate(tokens))):
             if not isinstance(w, list):
                 if w.phonemes is None:
-                    w.phonemes, w.rating = self.lexicon(replace(w), ctx)
+                    w.phonemes, w.rating = self.lexicon(w, ctx)
                 if w.phonemes is None and self.fallback is not None:
-                    w.phonemes, w.rating = self.fallback(replace(w))
+                    w.phonemes, w.rating = fallback(replace(w))
                 ctx = G2P.token_context(ctx, w.phonemes, w)
                 continue
             left, right = 0, len(w)
@@ -608,6 +991,11 @@ class G2P:
             while left < right:
                 if any(t.alias is not None or t.phonemes is not None for t in w[left:right]):
                     t = None
+                elif left + 1 == right:
+                    t = w[left]
+                elif not self.lexicon.may_resolve(''.join(t.text for t in w[left:right])):
+                    # Most windows of long hyphenated or camel-case words cannot match, so skip merging them.
+                    t = None
                 else:
                     t = MToken.merge_tokens(w[left:right])
                 ps, rating = (None, None) if t is None else self.lexicon(t, ctx)
@@ -635,12 +1023,192 @@ class G2P:
                     left = 0
             if should_fallback:
                 t = MToken.merge_tokens(w)
-                w[0].phonemes, w[0].rating = self.fallback(t)
+                w[0].phonemes, w[0].rating = fallback(t)
                 for j in range(1, len(w)):
                     w[j].phonemes = ''
                     w[j].rating = w[0].rating
             else:
                 G2P.resolve_tokens(w)
+
+    def merge(self, tokens: List[Union[MToken, List[MToken]]]) -> Tuple[str, List[MToken]]:
         tokens = [MToken.merge_tokens(t, unk=self.unk) if isinstance(t, list) else t for t in tokens]
         result = ''.join((self.unk if t.phonemes is None else t.phonemes) + t.whitespace for t in tokens)
         return result, tokens
+
+    @contextlib.contextmanager
+    def profile(self):
+        # Collects a CallProfile for every __call__ inside the block; set self.profiler to a callback instead to stream them.
+        profiles = []
+        previous, self.profiler = self.profiler, profiles.append
+        try:
+            yield profiles
+        finally:
+            self.profiler = previous
+
+    def profiled_call(self, text: str, preprocess=True) -> Tuple[str, List[MToken]]:
+        # Same steps as __call__ and resolve, with a monotonic timestamp after each one.
+        clock = time.perf_counter
+        profile = CallProfile(text)
+        marks = [('start', clock())]
+        preprocess = G2P.preprocess if preprocess == True else preprocess
+        text, tokens, features = preprocess(text) if preprocess else (text, [], {})
+        marks.append(('preprocess', clock()))
+        tokens = self.tokenize(text, tokens, features)
+        marks.append(('tokenize', clock()))
+        tokens = self.fold_left(tokens)
+        marks.append(('fold_left', clock()))
+        words = G2P.retokenize(tokens)
+        marks.append(('retokenize', clock()))
+        fallbacks = self.prefetch([words])
+        marks.append(('prefetch', clock()))
+        fallen, spent = Counter(), [0.0]
+        def fallback(t):
+            start = clock()
+            fallen[t.text] += 1
+            result = fallbacks[t.text] if t.text in fallbacks else self.fallback(t)
+            spent[0] += clock() - start
+            return result
+        pending = [w for w in words if isinstance(w, list) or w.phonemes is None]
+        self.lookup_words(words, fallback)
+        marks.append(('lookup', clock()))
+        result = self.merge(words)
+        marks.append(('merge', clock()))
+        profile.stages = {k: b - a for (_, a), (k, b) in zip(marks, marks[1:])}
+        profile.stages['lookup'] -= spent[0]
+        profile.stages['fallback'] = spent[0]
+        profile.stages['total'] = marks[-1][1] - marks[0][1]
+        sources = Counter()
+        for w in pending:
+            text = MToken.merge_tokens(w).text if isinstance(w, list) else w.text
+            if fallen[text]:
+                fallen[text] -= 1
+                sources['fallback'] += 1
+            elif isinstance(w, list):
+                sources.update(self.lexicon.source(t) or 'other' for t in w if t.phonemes)
+            else:
+                sources[self.lexicon.source(w) if w.phonemes is not None else 'unknown'] += 1
+        profile.sources = dict(sources)
+        self.profiler(profile)
+        return result
+
+class DualG2P:
+    """American and British English from one spaCy parse. Tokenizing, tagging, fold_left and retokenize
+    do not depend on the dialect, so they run once and only the lexicon lookups run per dialect.
+    Calls return ((us_phonemes, us_tokens), (gb_phonemes, gb_tokens)), the same as G2P(british=False)
+    and G2P(british=True) would."""
+    def __init__(self, trf=False, fallbacks=(None, None), unk='❓', compiled=False, derived=False, gated_tagging=False, cache_size=32768):
+        self.us = G2P(trf=trf, british=False, fallback=fallbacks[0], unk=unk, compiled=compiled, derived=derived, gated_tagging=gated_tagging, cache_size=cache_size)
+        self.gb = G2P(trf=trf, british=True, fallback=fallbacks[1], unk=unk, compiled=compiled, derived=derived, gated_tagging=gated_tagging, cache_size=cache_size)
+
+    def warmup(self):
+        self.us.warmup(), self.gb.warmup()
+        return self
+
+    def tag(self, text):
+        # With gated tagging, a sentence is tagged if either dialect needs it.
+        return self.us.gated_tag(text, lambda w: self.us.lexicon.needs_tag(w) or self.gb.lexicon.needs_tag(w))
+
+    @staticmethod
+    def copy_words(words: List[Union[MToken, List[MToken]]]) -> List[Union[MToken, List[MToken]]]:
+        return [[replace(t) for t in w] if isinstance(w, list) else replace(w) for w in words]
+
+    def __call__(self, text: str, preprocess=True) -> Tuple[Tuple[str, List[MToken]], Tuple[str, List[MToken]]]:
+        preprocess = G2P.preprocess if preprocess == True else preprocess
+        text, tokens, features = preprocess(text) if preprocess else (text, [], {})
+        doc = self.tag(text) if self.us.gated_tagging else None
+        us = self.us.prepare(self.us.tokenize(text, tokens, features, doc=doc))
+        gb = DualG2P.copy_words(us)
+        return self.us.resolve_words(us, self.us.prefetch([us])), self.gb.resolve_words(gb, self.gb.prefetch([gb]))
+
+    def batch(self, texts: List[str], preprocess=True, batch_size=256, n_process=1) -> List[Tuple[Tuple[str, List[MToken]], Tuple[str, List[MToken]]]]:
+        preprocess = G2P.preprocess if preprocess == True else preprocess
+        items = [preprocess(text) if preprocess else (text, [], {}) for text in texts]
+        texts = (text for text, _, _ in items)
+        docs = map(self.tag, texts) if self.us.gated_tagging else self.us.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+        us = [self.us.prepare(self.us.tokenize(text, tokens, features, doc=doc)) for (text, tokens, features), doc in zip(items, docs)]
+        gb = [DualG2P.copy_words(words) for words in us]
+        us_fallbacks, gb_fallbacks = self.us.prefetch(us), self.gb.prefetch(gb)
+        return [(self.us.resolve_words(u, us_fallbacks), self.gb.resolve_words(g, gb_fallbacks)) for u, g in zip(us, gb)]
+
+class Session:
+    """Phonemizes text that arrives in small deltas, e.g. streamed from an LLM. feed() returns the phonemes
+    of the words that became final, holding back only the last `lookahead` words of an unfinished sentence,
+    since their context and tags may still change; flush() returns the rest once the text is done."""
+    def __init__(self, g2p: G2P, lookahead=2, preprocess=True):
+        self.g2p = g2p
+        self.lookahead = lookahead
+        self.preprocess = G2P.preprocess if preprocess == True else preprocess
+        self.buffer = ''
+        self.first = True
+        # Characters of the current sentence, after preprocessing, whose words were already returned.
+        self.done = 0
+
+    def feed(self, delta: str) -> Tuple[str, List[MToken]]:
+        self.buffer += delta
+        # A word or sentence can only become final once whitespace follows it.
+        if not any(c.isspace() for c in delta):
+            return '', []
+        # Markup links, including one still open at the end, never hold a sentence break.
+        spans = [m.span() for m in LINK_REGEX.finditer(self.buffer)]
+        bracket = self.buffer.rfind('[')
+        if bracket >= 0 and not any(a <= bracket < b for a, b in spans):
+            spans.append((bracket, len(self.buffer) + 1))
+        results = []
+        start = 0
+        for end in G2P.sentence_breaks(self.buffer, spans)[:-1]:
+            results.append(self.emit(self.buffer[start:end], final=True))
+            start = end
+        self.buffer = self.buffer[start:]
+        results.append(self.emit(self.buffer, final=False))
+        return ''.join(ps for ps, _ in results), [t for _, ts in results for t in ts]
+
+    def flush(self) -> Tuple[str, List[MToken]]:
+        result = self.emit(self.buffer, final=True)
+        self.buffer = ''
+        self.first = True
+        return result
+
+    def emit(self, raw, final):
+        text, tokens, features = self.preprocess(raw) if self.preprocess else (raw, [], {})
+        if self.preprocess and not self.first:
+            # Preprocessing strips leading whitespace, but like G2P.stream only the first sentence should lose it.
+            space = raw[:len(raw) - len(raw.lstrip())]
+            text = space + text
+            features = {k if isinstance(k, int) else (k[0] + len(space), k[1] + len(space)): v for k, v in features.items()}
+        if final:
+            done, self.done, self.first = self.done, 0, False
+        else:
+            done = self.done
+        if not text.strip():
+            return '', []
+        words = self.g2p.prepare(self.g2p.tokenize(text, tokens, features))
+        # Character offset of each word, moving past the whole word (every subtoken and its whitespace)
+        # so a later word is never found inside an earlier compound.
+        starts, pos = [], 0
+        for w in words:
+            ts = w if isinstance(w, list) else [w]
+            pos = text.find(ts[0].text, pos)
+            starts.append(pos)
+            pos += sum(len(t.text) + len(t.whitespace) for t in ts)
+        i = next((i for i, s in enumerate(starts) if s >= done), len(words))
+        if final:
+            j = k = len(words)
+        else:
+            # spaCy splits on whitespace first, so the tokens of a whitespace-separated chunk are settled once
+            # whitespace follows it. All but the last few settled chunks are final, and an open markup link
+            # holds back everything from its bracket on.
+            settled = re.search(r'\S*$', text).start()
+            bracket = text.rfind('[')
+            if bracket >= 0 and ')' not in text[bracket:]:
+                settled = min(settled, re.search(r'\S*$', text[:bracket]).start())
+            chunks = [m.start() for m in re.finditer(r'\S+', text[:settled])]
+            limit = settled if not self.lookahead else (chunks[-self.lookahead] if self.lookahead <= len(chunks) else 0)
+            j = sum(1 for s in starts if s < limit)
+            k = sum(1 for s in starts if s < settled)
+        if j <= i:
+            return '', []
+        fallbacks = self.g2p.prefetch([words[i:j]])
+        self.g2p.lookup_words(words[i:k], lambda t: fallbacks[t.text] if t.text in fallbacks else self.g2p.fallback(t))
+        if not final:
+            self.done = starts[j] if j < len(starts) else len(text)
+        return self.g2p.merge(words[i:j])
@@ -1,13 +1,77 @@
 from phonemizer.backend.espeak.wrapper import EspeakWrapper
-from typing import List, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 import espeakng_loader
+import functools
+import os
 import phonemizer
 import re
+import sqlite3
+import threading
+from . import data, registry
 from .token import MToken
-import spacy
 import unicodedata
 
 
+class EspeakCache:
+    """Persistent SQLite cache of raw espeak output per (language, backend version, word).
+    Words espeak returns nothing for are stored too, as NULL."""
+    def __init__(self, path=None):
+        self.path = os.path.join(data.cache_dir(), "espeak.sqlite3") if path is None else path
+        self.lock = threading.Lock()
+        self.pid = None
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS phonemes (language TEXT, version TEXT, word TEXT, phonemes TEXT, "
+            "PRIMARY KEY (language, version, word)) WITHOUT ROWID"
+        )
+
+    @property
+    def db(self):
+        # SQLite connections must not cross a fork, so each process opens its own.
+        if self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.pid = os.getpid()
+        return self.connection
+
+    def get(self, language, version, words) -> Dict[str, Optional[str]]:
+        found = {}
+        with self.lock:
+            for i in range(0, len(words), 500):
+                chunk = words[i:i+500]
+                found.update(self.db.execute(
+                    f"SELECT word, phonemes FROM phonemes WHERE language = ? AND version = ? AND word IN ({','.join('?' * len(chunk))})",
+                    (language, version, *chunk),
+                ))
+        return found
+
+    def put(self, language, version, items: Dict[str, Optional[str]]):
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO phonemes VALUES (?, ?, ?, ?)",
+                ((language, version, w, ps) for w, ps in items.items()),
+            )
+
+
+def phonemize_words(backend, words, cache=None, language=None, version=None) -> Dict[str, Optional[str]]:
+    # Raw espeak output per word, or None where espeak returns nothing, with one backend call for all cache misses.
+    words = list(dict.fromkeys(words))
+    found = {} if cache is None else cache.get(language, version, words)
+    misses = [w for w in words if w not in found]
+    if not misses:
+        return found
+    ps = backend.phonemize(misses)
+    if len(misses) == 1:
+        new = {misses[0]: ps[0] if ps else None}
+    elif len(ps) == len(misses):
+        new = dict(zip(misses, ps))
+    else:
+        # espeak skips blank lines, so the output no longer lines up with the words.
+        return found
+    if cache is not None:
+        cache.put(language, version, new)
+    return {**found, **new}
+
+
 # EspeakFallback remains exactly the same as original
 class EspeakFallback:
     E2M = sorted(
@@ -38,22 +102,37 @@ class EspeakFallback:
         key=lambda kv: -len(kv[0]),
     )
 
-    def __init__(self, british):
+    def __init__(self, british, cache: Optional[EspeakCache] = None):
         self.british = british
         EspeakWrapper.set_library(espeakng_loader.get_library_path())
         EspeakWrapper.set_data_path(espeakng_loader.get_data_path())
+        self.language = f"en-{'gb' if british else 'us'}"
+        # One backend per instance: a phonemizer backend owns its copy of the espeak library and is not thread-safe.
         self.backend = phonemizer.backend.EspeakBackend(
-            language=f"en-{'gb' if british else 'us'}",
+            language=self.language,
             preserve_punctuation=True,
             with_stress=True,
             tie="^",
         )
+        self.cache = cache
+        self.version = f"{type(self).__name__}/{'.'.join(map(str, self.backend.version()))}"
+
+    def phonemize(self, words):
+        return phonemize_words(self.backend, words, self.cache, self.language, self.version)
 
     def __call__(self, token):
-        ps = self.backend.phonemize([token.text])
-        if not ps:
+        ps = self.phonemize([token.text]).get(token.text)
+        if ps is None:
             return None, None
-        ps = ps[0].strip()
+        return self.convert(ps)
+
+    def batch(self, words):
+        # Phonemizes many words in one espeak pass, one line per word, and returns {word: (phonemes, rating)}.
+        ps = self.phonemize([w for w in words if w.strip() and "\n" not in w])
+        return {w: self.convert(p) for w, p in ps.items() if p is not None}
+
+    def convert(self, ps):
+        ps = ps.strip()
         for old, new in type(self).E2M:
             ps = ps.replace(old, new)
         ps = re.sub(r"(\S)\u0329", r"ᵊ\1", ps).replace(chr(809), "")
@@ -88,7 +167,7 @@ class EspeakG2P:
         }.items()
     )
 
-    def __init__(self, language, unk="❓"):
+    def __init__(self, language, unk="❓", cache: Optional[EspeakCache] = None):
         self.language = language
         self.unk = unk
         self.backend = phonemizer.backend.EspeakBackend(
@@ -98,20 +177,28 @@ class EspeakG2P:
             tie="^",
             language_switch="remove-flags",
         )
+        self.cache = cache
+        self.version = f"{type(self).__name__}/{'.'.join(map(str, self.backend.version()))}"
+
+    @functools.cached_property
+    def nlp(self):
+        # Loaded on first use, or up front with warmup().
         try:
-            if language.startswith("en"):
+            if self.language.startswith("en"):
                 model = "en_core_web_sm"
-            elif language.startswith("pt"):
+            elif self.language.startswith("pt"):
                 model = "en_core_web_sm"
             else:
                 model = "en_core_web_sm"
 
-            if not spacy.util.is_package(model):
-                spacy.cli.download(model)
-            self.nlp = spacy.load(model, disable=["ner", "parser"])
+            return registry.spacy_pipeline(self, model, disable=["ner", "parser"])
         except Exception as e:
             print(f"Warning: Could not load spaCy model: {e}")
-            self.nlp = None
+            return None
+
+    def warmup(self):
+        self.nlp
+        return self
 
     def get_default_tag(self, word):
         if word.isalpha():
@@ -170,9 +257,9 @@ class EspeakG2P:
         # Token processing
         tokens = self.tokenize(text)
         for token in tokens:
-            token_ps = self.backend.phonemize([token.text])
-            if token_ps and token_ps[0].strip():
-                token.phonemes = token_ps[0].strip()
+            token_ps = phonemize_words(self.backend, [token.text], self.cache, self.language, self.version).get(token.text)
+            if token_ps and token_ps.strip():
+                token.phonemes = token_ps.strip()
                 token.rating = 3
             else:
                 token.phonemes = self.unk
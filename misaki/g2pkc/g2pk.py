@@ -3,16 +3,9 @@
 https://github.com/kyubyong/g2pK
 '''
 
+import functools
 import os, re
-import nltk
 from jamo import h2j
-from nltk.corpus import cmudict
-
-# For further info. about cmu dict, consult http://www.speech.cs.cmu.edu/cgi-bin/cmudict.
-try:
-    nltk.data.find('corpora/cmudict.zip')
-except LookupError:
-    nltk.download('cmudict')
 
 from .special import jyeo, ye, consonant_ui, josa_ui, vowel_ui, jamo, rieulgiyeok, rieulbieub, verb_nieun, balb, palatalize, modifying_rieul
 from .regular import link1, link2, link3, link4
@@ -23,14 +16,31 @@ from .numerals import convert_num
 
 class G2p(object):
     def __init__(self):
-        self.mecab = self.get_mecab()
         self.table = parse_table()
 
-        self.cmu = cmudict.dict() # for English
-
         self.rule2text = get_rule_id2text() # for comments of main rules
         self.idioms_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "idioms.txt")
 
+    # MeCab and the cmu dict load on first use, or up front with warmup().
+    @functools.cached_property
+    def mecab(self):
+        return self.get_mecab()
+
+    @functools.cached_property
+    def cmu(self):
+        # For further info. about cmu dict, consult http://www.speech.cs.cmu.edu/cgi-bin/cmudict.
+        import nltk
+        from nltk.corpus import cmudict
+        try:
+            nltk.data.find('corpora/cmudict.zip')
+        except LookupError:
+            nltk.download('cmudict')
+        return cmudict.dict() # for English
+
+    def warmup(self):
+        self.mecab, self.cmu
+        return self
+
     def get_mecab(self):
         if os.name == 'nt':
             import MeCab
@@ -93,7 +103,8 @@ class G2p(object):
         string = self.idioms(string, descriptive, verbose)
 
         # 2 English to Hangul
-        string = convert_eng(string, self.cmu)
+        if re.search("[A-Za-z]", string):
+            string = convert_eng(string, self.cmu)
 
         # 3. annotate
         if use_dict:
@@ -2,8 +2,8 @@
 from . import data
 from .num2kana import Convert
 from dataclasses import dataclass
-from fugashi import Tagger
 from typing import Tuple
+import functools
 import importlib.resources
 import jaconv
 import mojimoji
@@ -260,10 +260,19 @@ class Token:
 
 class JAG2P:
     def __init__(self):
-        self.tagger = Tagger()
         self.table = dict(HEPBURN) # make a copy so we can modify it
         self.exceptions = {}
 
+    @functools.cached_property
+    def tagger(self):
+        # The MeCab dictionary loads on first use, or up front with warmup().
+        from fugashi import Tagger
+        return Tagger()
+
+    def warmup(self):
+        self.tagger
+        return self
+
     def __call__(self, text) -> Tuple[str, None]:
         """Build a complete string from input text."""
         # TODO: Return List[MToken] instead of None
@@ -5,6 +5,10 @@ class KOG2P:
     def __init__(self):
         self.g2pk = G2p()
 
+    def warmup(self):
+        self.g2pk.warmup()
+        return self
+
     def __call__(self, text) -> Tuple[str, None]:
         # TODO: Return List[MToken] instead of None
         ps = self.g2pk(text)
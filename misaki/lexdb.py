@@ -0,0 +1,119 @@
+from collections.abc import Mapping
+from typing import Dict, Iterator, Union
+import json
+import mmap
+import os
+import struct
+import zlib
+
+# Compiled lexicon tables: an open-addressing hash table per table name,
+# laid out so it can be probed straight out of an mmap without parsing.
+#   header:    MAGIC, u32 version, u32 table count
+#   directory: per table, 16-byte name, u32 slot count, u32 entry count, u64 slot offset
+#   slots:     per slot, u32 crc32 of the key, u32 record offset (EMPTY if unused)
+#   records:   u16 key length, key, u8 value kind, u32 value length, value
+MAGIC = b'MLEX'
+VERSION = 1
+EMPTY = 0xFFFFFFFF
+HEADER = struct.Struct('<4sII')
+ENTRY = struct.Struct('<16sIIQ')
+SLOT = struct.Struct('<II')
+KEY = struct.Struct('<H')
+VALUE = struct.Struct('<BI')
+STR, JSON = 0, 1
+
+def _encode(v):
+    return (STR, v.encode()) if isinstance(v, str) else (JSON, json.dumps(v, ensure_ascii=False).encode())
+
+def write(path, tables: Dict[str, Dict[str, Union[str, dict]]]):
+    heap = bytearray()
+    directory = []
+    offset = HEADER.size + ENTRY.size * len(tables)
+    for name, d in tables.items():
+        n = 2 * len(d) + 1
+        slots = [(0, EMPTY)] * n
+        records = bytearray()
+        base = offset + SLOT.size * n
+        for k, v in d.items():
+            k = k.encode('utf-8', 'surrogatepass')
+            kind, v = _encode(v)
+            h = zlib.crc32(k)
+            i = h % n
+            while slots[i][1] != EMPTY:
+                i = (i + 1) % n
+            slots[i] = (h, base + len(records))
+            records += KEY.pack(len(k)) + k + VALUE.pack(kind, len(v)) + v
+        directory.append(ENTRY.pack(name.encode(), n, len(d), offset))
+        heap += b''.join(SLOT.pack(*s) for s in slots) + records
+        offset += SLOT.size * n + len(records)
+    assert offset < EMPTY, offset
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as w:
+        w.write(HEADER.pack(MAGIC, VERSION, len(tables)))
+        w.write(b''.join(directory))
+        w.write(heap)
+    os.replace(tmp, path)
+
+def load(path) -> Dict[str, 'Table']:
+    with open(path, 'rb') as r:
+        buf = mmap.mmap(r.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, count = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} compiled lexicon')
+    tables = {}
+    for i in range(count):
+        name, n, size, offset = ENTRY.unpack_from(buf, HEADER.size + i * ENTRY.size)
+        tables[name.rstrip(b'\0').decode()] = Table(buf, n, size, offset)
+    return tables
+
+class Table(Mapping):
+    """Read-only dict view over one table of a compiled lexicon."""
+    def __init__(self, buf, n, size, offset):
+        self.buf = buf
+        self.n = n
+        self.size = size
+        self.offset = offset
+
+    def _find(self, key):
+        if not isinstance(key, str):
+            return None
+        k = key.encode('utf-8', 'surrogatepass')
+        h = zlib.crc32(k)
+        i = h % self.n
+        while True:
+            sh, off = SLOT.unpack_from(self.buf, self.offset + i * SLOT.size)
+            if off == EMPTY:
+                return None
+            if sh == h:
+                klen, = KEY.unpack_from(self.buf, off)
+                if klen == len(k) and self.buf[off+2:off+2+klen] == k:
+                    return off + 2 + klen
+            i = (i + 1) % self.n
+
+    def _value(self, off):
+        kind, vlen = VALUE.unpack_from(self.buf, off)
+        v = self.buf[off+VALUE.size:off+VALUE.size+vlen].decode()
+        return v if kind == STR else json.loads(v)
+
+    def __getitem__(self, key):
+        off = self._find(key)
+        if off is None:
+            raise KeyError(key)
+        return self._value(off)
+
+    def get(self, key, default=None):
+        off = self._find(key)
+        return default if off is None else self._value(off)
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self.n):
+            _, off = SLOT.unpack_from(self.buf, self.offset + i * SLOT.size)
+            if off != EMPTY:
+                klen, = KEY.unpack_from(self.buf, off)
+                yield self.buf[off+2:off+2+klen].decode('utf-8', 'surrogatepass')
@@ -0,0 +1,111 @@
+# English Number Converter
+# Word lists follow num2words (https://github.com/savoirfairelinux/num2words) lang_EN,
+# so Lexicon.get_number output is unchanged, but numbers come out as lists of words
+# ready for lexicon lookup instead of strings to be split again.
+from bisect import bisect_right
+from decimal import Decimal
+from typing import List
+import math
+
+ONES = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten',
+        'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen', 'eighteen', 'nineteen']
+TENS = ['', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety']
+ORDS = {'one': 'first', 'two': 'second', 'three': 'third', 'four': 'fourth', 'five': 'fifth', 'six': 'sixth',
+        'seven': 'seventh', 'eight': 'eighth', 'nine': 'ninth', 'ten': 'tenth', 'eleven': 'eleventh', 'twelve': 'twelfth'}
+
+def _illions():
+    lows = ['non', 'oct', 'sept', 'sext', 'quint', 'quadr', 'tr', 'b', 'm']
+    units = ['', 'un', 'duo', 'tre', 'quattuor', 'quin', 'sex', 'sept', 'octo', 'novem']
+    tens = ['dec', 'vigint', 'trigint', 'quadragint', 'quinquagint', 'sexagint', 'septuagint', 'octogint', 'nonagint']
+    high = ['cent'] + [u + t for t in tens for u in units][::-1] + lows
+    return [(10 ** n, w + 'illion') for w, n in zip(high, range(3 + 3 * len(high), 3, -3))]
+
+CARDS = sorted([*_illions(), (1000, 'thousand'), (100, 'hundred'),
+                *((10 * i, TENS[i]) for i in range(3, 10)), *enumerate(ONES), (20, 'twenty')])
+CARD_VALUES = [n for n, _ in CARDS]
+MAXVAL = 1000 * CARD_VALUES[-1]
+
+# Every word the converters below can emit, except the rarer -illions and their ordinals.
+WORDS = frozenset([*ONES, *TENS[2:], *ORDS.values(), *(w[:-1] + 'ieth' for w in TENS[2:]),
+                   *(w + 'th' for w in ONES[13:]), 'hundred', 'thousand', 'million', 'billion', 'trillion',
+                   'hundredth', 'thousandth', 'millionth', 'billionth', 'trillionth', 'and', 'minus', 'oh', 'point'])
+
+def _split(value):
+    elem, word = CARDS[bisect_right(CARD_VALUES, value) - 1]
+    div, mod = (1, 0) if value == 0 else divmod(value, elem)
+    out = [([ONES[1]], 1) if div == 1 else _split(div), ([word], elem)]
+    if mod:
+        out.append(_split(mod))
+    return out
+
+def _merge(left, right):
+    (lwords, lnum), (rwords, rnum) = left, right
+    if lnum == 1 and rnum < 100:
+        return rwords, rnum
+    elif 100 > lnum > rnum:
+        return lwords + rwords, lnum + rnum
+    elif lnum >= 100 > rnum:
+        return lwords + ['and'] + rwords, lnum + rnum
+    elif rnum > lnum:
+        return lwords + rwords, lnum * rnum
+    return lwords + rwords, lnum + rnum
+
+def _clean(val):
+    out = val
+    while len(val) != 1:
+        out = []
+        left, right = val[:2]
+        if isinstance(left, tuple) and isinstance(right, tuple):
+            out.append(_merge(left, right))
+            if val[2:]:
+                out.append(val[2:])
+        else:
+            for elem in val:
+                if isinstance(elem, list):
+                    out.append(elem[0] if len(elem) == 1 else _clean(elem))
+                else:
+                    out.append(elem)
+        val = out
+    return out[0]
+
+def cardinal(value: int) -> List[str]:
+    if value < 0:
+        return ['minus'] + cardinal(-value)
+    elif value < 20:
+        return [ONES[value]]
+    elif value < 100:
+        return [TENS[value // 10]] + ([ONES[value % 10]] if value % 10 else [])
+    elif value >= MAXVAL:
+        raise OverflowError(f'abs({value}) must be less than {MAXVAL}.')
+    return _clean(_split(value))[0]
+
+def ordinal(value: int) -> List[str]:
+    words = cardinal(value)
+    last = words[-1]
+    if last in ORDS:
+        last = ORDS[last]
+    else:
+        last = (last[:-1] + 'ie' if last[-1] == 'y' else last) + 'th'
+    return words[:-1] + [last]
+
+def year(value: int) -> List[str]:
+    high, low = divmod(value, 100)
+    if high == 0 or (high % 10 == 0 and low < 10) or high >= 100:
+        return cardinal(value)
+    elif low == 0:
+        return cardinal(high) + ['hundred']
+    elif low < 10:
+        return cardinal(high) + ['oh'] + cardinal(low)
+    return cardinal(high) + cardinal(low)
+
+def decimal(text: str) -> List[str]:
+    # Same digits num2words(float(text)) reads out, including its float rounding.
+    value = float(text)
+    if int(value) == value:
+        return cardinal(int(value))
+    pre = int(value)
+    precision = abs(Decimal(str(value)).as_tuple().exponent)
+    post = abs(value - pre) * 10 ** precision
+    post = int(round(post)) if abs(round(post) - post) < 0.01 else int(math.floor(post))
+    post = str(post).rjust(precision, '0')
+    return cardinal(pre) + ['point'] + [ONES[int(d)] for d in post[:precision]]
@@ -0,0 +1,65 @@
+from typing import Iterable, Iterator, List, Tuple
+import gc
+import itertools
+import multiprocessing
+import os
+
+# G2P instances of every live Pool, set in the parent before forking so workers inherit them.
+_G2PS = {}
+
+def _run(args):
+    pool_id, key, texts = args
+    g2p = _G2PS[pool_id][key]
+    return g2p.batch(texts) if hasattr(g2p, 'batch') else [g2p(text) for text in texts]
+
+class Pool:
+    """Process pool for any misaki G2P. The G2Ps are loaded once in the parent and the workers are
+    forked from it, so spaCy models, lexicons and dictionaries are shared copy-on-write instead of
+    loaded per process. Pass one G2P, or a dict of them to pick from with `key` (e.g. a language).
+    Needs the fork start method, so it is not available on Windows."""
+    def __init__(self, g2ps, processes=None, chunksize=32):
+        self.g2ps = g2ps if isinstance(g2ps, dict) else {None: g2ps}
+        self.processes = processes or os.cpu_count()
+        self.chunksize = chunksize
+        self.id = id(self)
+        _G2PS[self.id] = self.g2ps
+        # Load everything lazy now, or each worker would load its own copy.
+        for g2p in self.g2ps.values():
+            if hasattr(g2p, 'warmup'):
+                g2p.warmup()
+        # Move everything loaded so far out of the collector's reach, so collections in the workers
+        # do not write to (and so copy) the shared pages.
+        gc.collect()
+        gc.freeze()
+        try:
+            self.pool = multiprocessing.get_context('fork').Pool(self.processes)
+        finally:
+            gc.unfreeze()
+
+    def imap(self, texts: Iterable[str], key=None, chunksize=None) -> Iterator[Tuple[str, object]]:
+        # Results come back in input order, the same as g2p.batch(texts) in one process.
+        if key not in self.g2ps:
+            raise KeyError(key)
+        texts = iter(texts)
+        chunksize = chunksize or self.chunksize
+        chunks = iter(lambda: list(itertools.islice(texts, chunksize)), [])
+        for results in self.pool.imap(_run, ((self.id, key, chunk) for chunk in chunks)):
+            yield from results
+
+    def batch(self, texts: List[str], key=None, chunksize=None) -> List[Tuple[str, object]]:
+        if chunksize is None:
+            # Enough chunks to keep every worker busy, but no larger than self.chunksize.
+            chunksize = max(1, min(self.chunksize, -(-len(texts) // self.processes)))
+        return list(self.imap(texts, key=key, chunksize=chunksize))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        _G2PS.pop(self.id, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.pool.terminate()
+        _G2PS.pop(self.id, None)
@@ -0,0 +1,42 @@
+# Process-wide registry of expensive resources (spaCy pipelines, lexicons), so every G2P built with the
+# same configuration shares one copy. Shared resources are shared state: mutating one (e.g. a lexicon's
+# set_cache_size) affects every G2P holding it. espeak backends are not thread-safe, so they are never pooled.
+# Each owner holds a reference until it is garbage collected; a resource is dropped when its last owner goes away.
+from typing import Callable, Dict, Hashable
+import threading
+import weakref
+
+_LOCK = threading.RLock()
+_ENTRIES = {}
+
+def acquire(owner, key: Hashable, factory: Callable[[], object]):
+    # Returns the resource for key, building it with factory() if no live owner holds it yet.
+    with _LOCK:
+        if key in _ENTRIES:
+            _ENTRIES[key][1] += 1
+        else:
+            _ENTRIES[key] = [factory(), 1]
+        resource = _ENTRIES[key][0]
+    weakref.finalize(owner, release, key)
+    return resource
+
+def release(key: Hashable):
+    with _LOCK:
+        entry = _ENTRIES.get(key)
+        if entry is not None:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del _ENTRIES[key]
+
+def references() -> Dict[Hashable, int]:
+    with _LOCK:
+        return {key: count for key, (_, count) in _ENTRIES.items()}
+
+def spacy_pipeline(owner, model, **kwargs):
+    # Downloads the model if needed. kwargs (enable=, disable=) are part of the key.
+    def load():
+        import spacy
+        if not spacy.util.is_package(model):
+            spacy.cli.download(model)
+        return spacy.load(model, **kwargs)
+    return acquire(owner, ('spacy', model, tuple(sorted((k, tuple(v)) for k, v in kwargs.items()))), load)
@@ -0,0 +1,137 @@
+from . import aio
+from collections import deque
+from typing import Dict
+import asyncio
+import json
+import time
+
+def load(language):
+    # Builds the G2P for a language code, fully loaded; anything not handled natively goes to espeak.
+    if language in ('en', 'en-us', 'en-gb'):
+        from . import en
+        g2p = en.G2P(trf=False, british=language == 'en-gb')
+    elif language == 'ja':
+        from . import ja
+        g2p = ja.JAG2P()
+    elif language == 'ko':
+        from . import ko
+        g2p = ko.KOG2P()
+    elif language in ('zh', 'zh-1.1'):
+        from . import zh
+        g2p = zh.ZHG2P(version='1.1' if language == 'zh-1.1' else None)
+    elif language == 'vi':
+        from . import vi
+        g2p = vi.VIG2P()
+    else:
+        from . import espeak
+        espeak.EspeakWrapper.set_library(espeak.espeakng_loader.get_library_path())
+        espeak.EspeakWrapper.set_data_path(espeak.espeakng_loader.get_data_path())
+        g2p = espeak.EspeakG2P(language)
+    return g2p.warmup()
+
+class Server:
+    """Minimal HTTP/1.1 JSON server over TCP or a Unix socket that keeps G2Ps resident.
+    POST /g2p with {"text": ..., "language": ...} (or "texts": [...]) returns the phonemes;
+    requests for one language arriving within `window` seconds share one g2p.batch call.
+    GET /stats reports queue depth and per-request latency. A language may map to a list of separately
+    built G2Ps to phonemize that many batches at once; a single G2P only ever runs one call at a time."""
+    def __init__(self, g2ps: Dict[str, object], window=0.005, max_batch=64):
+        self.g2ps = {
+            k: aio.AsyncG2P(g2p, max_workers=len(g2p) if isinstance(g2p, list) else 1, window=window, max_batch=max_batch)
+            for k, g2p in g2ps.items()
+        }
+        self.default = next(iter(self.g2ps))
+        self.depth = 0
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=4096)
+
+    async def phonemize(self, body):
+        language = body.get('language', self.default)
+        if language not in self.g2ps:
+            raise ValueError(f'language {language!r} is not loaded')
+        g2p = self.g2ps[language]
+        # Checked before anything is queued, since a bad text would otherwise fail its whole batch window.
+        if 'texts' in body:
+            if not isinstance(body['texts'], list) or not all(isinstance(text, str) for text in body['texts']):
+                raise ValueError('texts must be a list of strings')
+            results = await asyncio.gather(*(g2p.acall(text) for text in body['texts']))
+            return {'language': language, 'phonemes': [ps for ps, _ in results]}
+        if not isinstance(body['text'], str):
+            raise ValueError('text must be a string')
+        ps, _ = await g2p.acall(body['text'])
+        return {'language': language, 'phonemes': ps}
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        pick = lambda q: round(1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3) if latencies else None
+        return {
+            'queue_depth': self.depth,
+            'pending': {k: len(g2p.pending) for k, g2p in self.g2ps.items()},
+            'requests': self.requests,
+            'errors': self.errors,
+            'latency_ms': {'p50': pick(0.5), 'p95': pick(0.95), 'p99': pick(0.99), 'max': pick(1)},
+        }
+
+    async def route(self, method, path, body):
+        if method == 'GET' and path == '/stats':
+            return 200, self.stats()
+        elif method != 'POST' or path != '/g2p':
+            return 404, {'error': f'no route for {method} {path}'}
+        start = time.perf_counter()
+        self.depth += 1
+        try:
+            result = await self.phonemize(json.loads(body))
+            status = 200
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            result = {'error': f'missing {e}' if isinstance(e, KeyError) else str(e)}
+            status = 400
+            self.errors += 1
+        except Exception as e:
+            result = {'error': f'{type(e).__name__}: {e}'}
+            status = 500
+            self.errors += 1
+        finally:
+            self.depth -= 1
+        latency = time.perf_counter() - start
+        self.requests += 1
+        self.latencies.append(latency)
+        result['latency_ms'] = round(1000 * latency, 3)
+        return status, result
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, path, _ = line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    k, _, v = line.decode('latin-1').partition(':')
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, result = await self.route(method, path, body)
+                payload = json.dumps(result, ensure_ascii=False).encode()
+                writer.write(
+                    f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                    f'Content-Type: application/json; charset=utf-8\r\nContent-Length: {len(payload)}\r\n\r\n'.encode() + payload
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080, unix=None):
+        if unix:
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
@@ -1,6 +1,21 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import List, Optional, Union
 
+def slotted(cls):
+    # Rebuilds a dataclass with __slots__, like @dataclass(slots=True) which needs Python 3.10.
+    names = tuple(f.name for f in fields(cls))
+    body = {k: v for k, v in cls.__dict__.items() if k not in names and k not in ('__dict__', '__weakref__')}
+    body['__slots__'] = names
+    if cls.__dataclass_params__.frozen:
+        def __getstate__(self):
+            return [getattr(self, n) for n in names]
+        def __setstate__(self, state):
+            for n, v in zip(names, state):
+                object.__setattr__(self, n, v)
+        body.update(__getstate__=__getstate__, __setstate__=__setstate__)
+    return type(cls)(cls.__name__, cls.__bases__, body)
+
+@slotted
 @dataclass
 class MToken:
     text: str
@@ -421,7 +421,13 @@ class VIG2P:
         else:
             self.cao = 1
         en_g2p_kwargs["unk"] = '❓'
+        # Cheap to build: the English G2P loads its spaCy model and lexicon on first use.
         self.en_g2p = G2P(**en_g2p_kwargs) if enable_en_g2p else lambda _: ('❓', [])
+
+    def warmup(self):
+        if hasattr(self.en_g2p, 'warmup'):
+            self.en_g2p.warmup()
+        return self
     
     def substr2ipa(self, tk, ipa):
         """
@@ -0,0 +1,75 @@
+from .token import MToken
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import json
+import numpy as np
+
+@dataclass
+class Encoding:
+    ids: np.ndarray
+    # Per token [start, end) into ids, when tokens were given.
+    spans: Optional[np.ndarray] = None
+    # (index into the phoneme string, symbol) for every symbol missing from the vocab.
+    unknown: List[Tuple[int, str]] = field(default_factory=list)
+
+class Vocab:
+    """Maps phoneme strings from any misaki G2P to model token IDs, e.g. Kokoro's config.json vocab,
+    with one vectorized lookup over the code points instead of a Python loop per character."""
+    def __init__(self, vocab: Dict[str, int]):
+        assert all(len(k) == 1 for k in vocab), [k for k in vocab if len(k) != 1]
+        self.vocab = vocab
+        self.lut = np.full(max(map(ord, vocab)) + 1, -1, dtype=np.int64)
+        for k, v in vocab.items():
+            self.lut[ord(k)] = v
+
+    @classmethod
+    def from_config(cls, path):
+        with open(path, encoding='utf-8') as r:
+            return cls(json.load(r)['vocab'])
+
+    def lookup(self, phonemes: str) -> np.ndarray:
+        # IDs for each code point, -1 where the symbol is not in the vocab.
+        cps = np.frombuffer(phonemes.encode('utf-32-le'), dtype=np.uint32)
+        ids = np.full(len(cps), -1, dtype=np.int64)
+        inside = cps < len(self.lut)
+        ids[inside] = self.lut[cps[inside]]
+        return ids
+
+    def encode(self, phonemes: str, tokens: Optional[Sequence[MToken]] = None, unk='❓', strict=False) -> Encoding:
+        # Unknown symbols are left out of ids and listed in Encoding.unknown, or raise ValueError if strict.
+        ids = self.lookup(phonemes)
+        known = ids >= 0
+        unknown = [(int(i), phonemes[i]) for i in np.flatnonzero(~known)]
+        if unknown and strict:
+            raise ValueError(f'Symbols not in vocab: {sorted({c for _, c in unknown})}')
+        spans = None if tokens is None else Vocab.spans(phonemes, tokens, known, unk)
+        return Encoding(ids[known], spans, unknown)
+
+    @staticmethod
+    def spans(phonemes, tokens, known, unk):
+        # Token i covers its phonemes in the joined string, as G2P builds it: phonemes (or unk) + whitespace.
+        bounds, pos = [], 0
+        for t in tokens:
+            n = len(unk if t.phonemes is None else t.phonemes)
+            bounds.append((pos, pos + n))
+            pos += n + len(t.whitespace)
+        if pos != len(phonemes):
+            raise ValueError('tokens do not add up to the phoneme string')
+        offsets = np.concatenate([[0], np.cumsum(known)])
+        return offsets[np.array(bounds, dtype=np.int64).reshape(-1, 2)]
+
+    def encode_batch(self, results: Sequence[Union[str, Tuple[str, object]]], unk='❓', strict=False) -> List[Encoding]:
+        # One lookup over the whole batch; each result is a phoneme string or a (phonemes, tokens) pair from a G2P.
+        pairs = [(r, None) if isinstance(r, str) else r for r in results]
+        ids = self.lookup(''.join(ps for ps, _ in pairs))
+        encodings, start = [], 0
+        for ps, tokens in pairs:
+            chunk = ids[start:start+len(ps)]
+            known = chunk >= 0
+            unknown = [(int(i), ps[i]) for i in np.flatnonzero(~known)]
+            if unknown and strict:
+                raise ValueError(f'Symbols not in vocab: {sorted({c for _, c in unknown})}')
+            spans = Vocab.spans(ps, tokens, known, unk) if isinstance(tokens, list) else None
+            encodings.append(Encoding(chunk[known], spans, unknown))
+            start += len(ps)
+        return encodings
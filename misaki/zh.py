@@ -1,20 +1,30 @@
-from .transcription import pinyin_to_ipa
-from pypinyin import lazy_pinyin, Style
 from typing import Tuple
-import cn2an
-import jieba
+import functools
 import re
 
+# pypinyin, jieba and cn2an are imported on first use, so importing this module stays cheap.
 class ZHG2P:
     def __init__(self, version=None, unk='❓', en_callable=None):
         self.version = version
-        self.frontend = None
+        self.unk = unk
         self.en_callable = en_callable
-        if version == '1.1':
-            from .zh_frontend import ZHFrontend
-            self.frontend = ZHFrontend(unk=unk)
-            if en_callable is None:
-                print('Warning: en_callable is None, so English may be removed')
+        if version == '1.1' and en_callable is None:
+            print('Warning: en_callable is None, so English may be removed')
+
+    @functools.cached_property
+    def frontend(self):
+        # Loads the pypinyin dictionaries on first use, or up front with warmup().
+        if self.version != '1.1':
+            return None
+        from .zh_frontend import ZHFrontend
+        return ZHFrontend(unk=self.unk)
+
+    def warmup(self):
+        import cn2an
+        import jieba
+        jieba.initialize()
+        self.frontend
+        return self
 
     @staticmethod
     def retone(p):
@@ -28,10 +38,12 @@ class ZHG2P:
 
     @staticmethod
     def py2ipa(py):
+        from .transcription import pinyin_to_ipa
         return ''.join(ZHG2P.retone(p) for p in pinyin_to_ipa(py)[0])
 
     @staticmethod
     def word2ipa(w):
+        from pypinyin import lazy_pinyin, Style
         pinyins = lazy_pinyin(w, style=Style.TONE3, neutral_tone_with_five=True)
         return ''.join(ZHG2P.py2ipa(py) for py in pinyins)
 
@@ -52,6 +64,7 @@ class ZHG2P:
 
     @staticmethod
     def legacy_call(text) -> str:
+        import jieba
         is_zh = re.match(f'[\u4E00-\u9FFF]', text[0])
         result = ''
         for segment in re.findall(f'[\u4E00-\u9FFF]+|[^\u4E00-\u9FFF]+', text):
@@ -65,6 +78,7 @@ class ZHG2P:
     def __call__(self, text, en_callable=None) -> Tuple[str, None]:
         if not text.strip():
             return '', None
+        import cn2an
         text = cn2an.transform(text, 'an2cn')
         text = ZHG2P.map_punctuation(text)
         if self.frontend is None:
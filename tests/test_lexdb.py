@@ -0,0 +1,51 @@
+import random
+import pytest
+from misaki import lexdb
+from misaki.en import Lexicon, TokenContext
+
+def test_round_trip(tmp_path):
+    tables = {
+        'gold': {'hello': 'həlˈO', 'used': {'DEFAULT': 'jˈuzd', 'VBD': 'jˈust', 'None': None}, 'café': 'kæfˈA', '日本': 'nˈihɔn', "'s": 'z'},
+        'silver': {'x' * 300: 'ˈɛks', 'naïve': 'nɑˈiv'},
+        'empty': {},
+    }
+    path = tmp_path / 'test.mlex'
+    lexdb.write(path, tables)
+    loaded = lexdb.load(path)
+    assert set(loaded) == set(tables)
+    for name, table in tables.items():
+        assert dict(loaded[name]) == table
+        assert len(loaded[name]) == len(table)
+        assert all(k in loaded[name] and loaded[name][k] == v for k, v in table.items())
+    assert 'missing' not in loaded['gold'] and loaded['gold'].get('missing', 1) == 1
+    assert 5 not in loaded['gold']
+    with pytest.raises(KeyError):
+        loaded['empty']['hello']
+
+def test_not_a_lexicon(tmp_path):
+    path = tmp_path / 'bad.mlex'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        lexdb.load(path)
+
+@pytest.mark.parametrize('british', [False, True])
+def test_compiled_lexicon_matches_json(tmp_path, monkeypatch, british):
+    # Every 10th entry of the dictionaries keeps compiling the derived forms fast; letters and symbols stay for get_NNP.
+    grow_dictionary = Lexicon.grow_dictionary
+    subset = lambda d: {k: d[k] for i, k in enumerate(sorted(d)) if i % 10 == 0 or len(k) < 2}
+    monkeypatch.setattr(Lexicon, 'grow_dictionary', staticmethod(lambda d: grow_dictionary(subset(d))))
+    source = Lexicon(british, cache_size=0)
+    path = Lexicon.compile(british, str(tmp_path / 'lexicon.mlex'), derived=True)
+    compiled = Lexicon(british, compiled=path, cache_size=0)
+    derived = Lexicon(british, compiled=path, derived=True, cache_size=0)
+    assert dict(compiled.golds) == source.golds and dict(compiled.silvers) == source.silvers
+    assert set(compiled.compound_keys) == source.compound_keys
+    rng = random.Random(0)
+    words = rng.sample(sorted(source.golds), 1000) + rng.sample(sorted(source.silvers), 1000)
+    words += [w + s for w in words[::4] for s in ('s', "'s", 'ed', 'ing')] + ['Zorblax', 'NASA', "don't", '1990s', '3rd', '$5']
+    ctx = TokenContext()
+    for w in words:
+        for tag in ('NN', 'VBD', 'NNP'):
+            expected = source.resolve(w, tag, None, None, '', True, ctx)
+            assert compiled.resolve(w, tag, None, None, '', True, ctx) == expected, w
+            assert derived.resolve(w, tag, None, None, '', True, ctx) == expected, w
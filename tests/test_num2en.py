@@ -0,0 +1,32 @@
+import random
+import re
+import pytest
+from misaki import num2en
+
+num2words = pytest.importorskip('num2words').num2words
+
+def words(text):
+    # The same split en.py applied to num2words output before num2en replaced it.
+    return [w for w in re.split(r'[^a-z]+', text) if w]
+
+def sample():
+    rng = random.Random(0)
+    return [*range(-1000, 10000), *(rng.randrange(10 ** n) for n in range(5, 25) for _ in range(200))]
+
+def test_cardinal():
+    assert [num2en.cardinal(v) for v in sample()] == [words(num2words(v)) for v in sample()]
+
+def test_ordinal():
+    values = [v for v in sample() if v >= 0]
+    assert [num2en.ordinal(v) for v in values] == [words(num2words(v, to='ordinal')) for v in values]
+
+def test_year():
+    # en.G2P reads four-digit numbers as years.
+    values = range(1000, 10000)
+    assert [num2en.year(v) for v in values] == [words(num2words(v, to='year')) for v in values]
+
+def test_decimal():
+    rng = random.Random(0)
+    texts = [f'{rng.randrange(10 ** rng.randrange(1, 7))}.{rng.randrange(10 ** 6):0{rng.randrange(1, 7)}d}' for _ in range(5000)]
+    texts += ['0.5', '1.0', '10.05', '3.14159', '2.675', '0.1', '99.99']
+    assert [num2en.decimal(t) for t in texts] == [words(num2words(float(t))) for t in texts]
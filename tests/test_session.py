@@ -0,0 +1,35 @@
+import importlib.util
+import pytest
+
+pytestmark = pytest.mark.skipif(importlib.util.find_spec('en_core_web_sm') is None, reason='needs en_core_web_sm')
+
+COMPOUNDS = [
+    'It is up-to-date to date.',
+    'A state-of-the-art of the art.',
+    'Email foo_bar bar now. The iPhone phone is a Phone.',
+    'We went door-to-door, then door to door. Next time, the long-term term.',
+    'Call snake_case_name case name now.',
+    'Use my_var_name var name or the_a the a.',
+]
+
+@pytest.fixture(scope='module')
+def g2p():
+    from misaki import en
+    return en.G2P()
+
+def feed(g2p, text, lookahead):
+    # One character at a time, the worst case for an LLM stream.
+    session = g2p.session(lookahead=lookahead)
+    results = [session.feed(c) for c in text] + [session.flush()]
+    return ''.join(ps for ps, _ in results), [t.text for _, ts in results for t in ts]
+
+@pytest.mark.parametrize('text', COMPOUNDS)
+@pytest.mark.parametrize('lookahead', [1, 2])
+def test_session_matches_stream(g2p, text, lookahead):
+    expected = list(g2p.stream(text))
+    ps, words = feed(g2p, text, lookahead)
+    # Every word comes out exactly once, whole, even when it also occurs inside an earlier compound.
+    assert words == [t.text for _, ts in expected for t in ts]
+    if lookahead >= 2:
+        # With one word of lookahead, a held-back word's tag can still change the context of the word before it.
+        assert ps == ''.join(ps for ps, _ in expected)